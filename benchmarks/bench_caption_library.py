@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Benchmark near-duplicate lookups in the caption library.
+
+Fills a fresh library with synthetic used captions, then times lookups for
+unrelated captions and for captions one word away from a stored one.
+
+Usage:
+    python benchmarks/bench_caption_library.py [--count 100000] [--queries 500]
+"""
+
+import sys
+import time
+import random
+import string
+import argparse
+import tempfile
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.levibes.caption_library import CaptionLibrary  # noqa: E402
+
+COMMON_WORDS = "the a of in is to and you your we our all be when it".split()
+
+
+def make_captions(rng, count, vocabulary):
+    """Build captions of 6 to 12 words from the vocabulary."""
+    return [" ".join(rng.choice(vocabulary) for _ in range(rng.randint(6, 12))) for _ in range(count)]
+
+
+def time_lookups(library, captions):
+    """Return milliseconds per lookup and the number of captions found similar."""
+    start = time.perf_counter()
+    found = sum(library.find_similar(caption) is not None for caption in captions)
+    return (time.perf_counter() - start) * 1000 / len(captions), found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=100000, help="Captions in the library (default: 100000)")
+    parser.add_argument("--queries", type=int, default=500, help="Lookups per query type (default: 500)")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    words = ["".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 9))) for _ in range(3000)]
+    vocabulary = COMMON_WORDS * 20 + words
+    captions = make_captions(rng, args.count, vocabulary)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        library = CaptionLibrary(Path(tmp) / "captions.sqlite3")
+
+        start = time.perf_counter()
+        for i in range(0, len(captions), 1000):
+            library.mark_used(captions[i:i + 1000])
+        insert_seconds = time.perf_counter() - start
+        print(f"Inserted {library.count()} captions in {insert_seconds:.1f}s "
+              f"({insert_seconds * 1e6 / len(captions):.0f} us/caption)")
+
+        unrelated = make_captions(rng, args.queries, vocabulary)
+        near = []
+        for caption in rng.sample(captions, args.queries):
+            caption_words = caption.split()
+            caption_words[rng.randrange(len(caption_words))] = "changed"
+            near.append(" ".join(caption_words))
+
+        miss_ms, false_hits = time_lookups(library, unrelated)
+        near_ms, hits = time_lookups(library, near)
+        library.close()
+
+    print(f"{'query':<12}{'ms/lookup':>12}{'flagged':>12}")
+    print(f"{'unrelated':<12}{miss_ms:>12.3f}{false_hits / args.queries:>12.1%}")
+    print(f"{'one word off':<12}{near_ms:>12.3f}{hits / args.queries:>12.1%}")
+
+
+if __name__ == "__main__":
+    main()
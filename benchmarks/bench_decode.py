@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Benchmark source image decoding with and without JPEG draft mode.
+
+Generates a fixture set of large JPEGs, then decodes and resizes them to the
+render size in a fresh process per mode so peak RSS is measured in isolation.
+
+Usage:
+    python benchmarks/bench_decode.py [--count 20] [--size 4032x3024] [--fixtures DIR]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import tempfile
+import subprocess
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from PIL import Image  # noqa: E402
+from src.levibes.config import DEFAULT_IMAGE_SIZE  # noqa: E402
+from src.levibes.sources import list_source_images, prepare_source_image  # noqa: E402
+
+MODES = {"full": False, "draft": True}
+
+
+def create_fixtures(directory, count, size):
+    """Write noisy photo-sized JPEG fixtures so decoding has real work to do."""
+    os.makedirs(directory, exist_ok=True)
+    for i in range(count):
+        path = os.path.join(directory, f"large_{i:03d}.jpg")
+        if os.path.exists(path):
+            continue
+        bands = [Image.effect_noise(size, 40 + i % 20) for _ in range(3)]
+        Image.merge("RGB", bands).save(path, "JPEG", quality=90)
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in megabytes."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_child(mode, directory, resample):
+    """Decode every fixture in this process and print the measurements as JSON."""
+    paths = sorted(list_source_images(directory))
+    start = time.perf_counter()
+    for path in paths:
+        prepare_source_image(path, DEFAULT_IMAGE_SIZE, resample, MODES[mode])
+    elapsed = time.perf_counter() - start
+    print(json.dumps({
+        "mode": mode,
+        "images": len(paths),
+        "seconds": round(elapsed, 4),
+        "ms_per_image": round(elapsed * 1000 / max(1, len(paths)), 2),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=20, help="Number of fixture images (default: 20)")
+    parser.add_argument("--size", default="4032x3024", help="Fixture size as WIDTHxHEIGHT (default: 4032x3024)")
+    parser.add_argument("--fixtures", help="Fixture directory (default: a temporary directory)")
+    parser.add_argument("--resample", default="bicubic", help="Resampling filter (default: bicubic)")
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.fixtures, args.resample)
+        return
+
+    width, height = (int(part) for part in args.size.lower().split("x"))
+    with tempfile.TemporaryDirectory() as tmp:
+        fixtures = args.fixtures or tmp
+        print(f"Creating {args.count} {width}x{height} JPEG fixtures in {fixtures}")
+        create_fixtures(fixtures, args.count, (width, height))
+
+        results = {}
+        for mode in MODES:
+            output = subprocess.run(
+                [sys.executable, __file__, "--child", mode, "--fixtures", fixtures, "--resample", args.resample],
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+            results[mode] = json.loads(output)
+
+    print(f"{'mode':<8}{'ms/image':>12}{'total (s)':>12}{'peak RSS (MB)':>16}")
+    for mode, result in results.items():
+        print(f"{mode:<8}{result['ms_per_image']:>12}{result['seconds']:>12}{result['peak_rss_mb']:>16}")
+
+    full, draft = results["full"], results["draft"]
+    print(
+        f"\ndraft mode: {full['seconds'] / draft['seconds']:.1f}x faster, "
+        f"{full['peak_rss_mb'] - draft['peak_rss_mb']:.1f} MB lower peak RSS"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Benchmark rendering: single images and whole batches.
+
+process_single_image is timed for each caption length (short, the 13-word
+prompt limit, and one long unbreakable word), source size and source
+format, varying one axis at a time from a 1600x2000 JPEG with a 13-word
+caption. generate_images_async is timed rendering 10, 100 and 1000 images;
+it uses every CPU, so it is only compared against a baseline recorded with
+the same CPU count.
+
+Usage:
+    python benchmarks/bench_render.py [--counts 10,100,1000] [--repeat 5] [--save-baseline]
+"""
+
+import os
+import sys
+import asyncio
+import argparse
+import tempfile
+
+from common import PROJECT_ROOT, add_baseline_args, finish, measure
+
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from PIL import Image  # noqa: E402
+from src.levibes.generate_images import (  # noqa: E402
+    RenderSettings,
+    configure_renderer,
+    generate_images_async,
+    process_single_image,
+)
+from src.levibes.text_layout import clear_layout_cache  # noqa: E402
+from src.levibes.utils.logger import set_quiet  # noqa: E402
+
+CAPTIONS = {
+    "short": "keep going",
+    "13-words": "the hardest part of any journey is deciding that you are worth it",
+    "long-word": "unstoppable" * 12,
+}
+SIZES = {"1080x1350": (1080, 1350), "1600x2000": (1600, 2000), "4032x3024": (4032, 3024)}
+FORMATS = {"jpg": "JPEG", "png": "PNG", "webp": "WEBP"}
+DEFAULT_CASE = ("13-words", "1600x2000", "jpg")
+BATCH_FIXTURES = 10
+
+
+def create_fixture(path, size, image_format, seed=0):
+    """Write a noisy photo-like image so decoding has real work to do."""
+    if not os.path.exists(path):
+        bands = [Image.effect_noise(size, 40 + (seed + band) % 20) for band in range(3)]
+        Image.merge("RGB", bands).save(path, image_format)
+    return path
+
+
+def single_image_cases():
+    """Vary caption, size and format one at a time from the default case."""
+    caption, size, image_format = DEFAULT_CASE
+    cases = [(name, size, image_format) for name in CAPTIONS]
+    cases += [(caption, name, image_format) for name in SIZES]
+    cases += [(caption, size, name) for name in FORMATS]
+    return list(dict.fromkeys(cases))
+
+
+def uncached(render):
+    """Clear the in-memory layout cache before each call, so every call fits its caption."""
+
+    def run():
+        clear_layout_cache()
+        render()
+
+    return run
+
+
+def bench_single_images(fixtures_dir, output_dir, repeat):
+    results = {}
+    for caption, size, image_format in single_image_cases():
+        path = create_fixture(
+            os.path.join(fixtures_dir, f"source_{size}.{image_format}"), SIZES[size], FORMATS[image_format]
+        )
+        render = lambda: asyncio.run(process_single_image(path, CAPTIONS[caption], output_dir))  # noqa: E731
+        results[f"process_single_image[{caption},{size},{image_format}]"] = measure(uncached(render), repeat)
+    return results
+
+
+def bench_batches(fixtures_dir, output_dir, counts, repeat):
+    results = {}
+    sources = [
+        create_fixture(os.path.join(fixtures_dir, f"batch_{i}.jpg"), SIZES["1080x1350"], "JPEG", i)
+        for i in range(BATCH_FIXTURES)
+    ]
+    for count in counts:
+        # Hard links give each batch enough distinct source paths without the disk space
+        images_dir = os.path.join(fixtures_dir, f"batch_{count}")
+        os.makedirs(images_dir, exist_ok=True)
+        for i in range(count):
+            link = os.path.join(images_dir, f"image_{i:04d}.jpg")
+            if not os.path.exists(link):
+                os.link(sources[i % BATCH_FIXTURES], link)
+
+        captions = [CAPTIONS["13-words"]] * count
+        render = lambda: asyncio.run(generate_images_async(captions, images_dir, output_dir))  # noqa: E731
+        # Large batches are slow enough that a single timed run is stable
+        results[f"generate_images_async[{count}]"] = measure(uncached(render), repeat if count < 1000 else 1)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--counts", default="10,100,1000", help="Batch sizes for generate_images_async (default: 10,100,1000)")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per case (default: 5)")
+    parser.add_argument("--fixtures", help="Directory to keep fixtures in between runs (default: a temporary directory)")
+    add_baseline_args(parser)
+    args = parser.parse_args()
+
+    set_quiet(True)
+    # No on-disk layout or source cache, and the in-memory layout cache is
+    # cleared before each run, so every run pays for fitting its caption.
+    # Loaded fonts stay cached, as they do in a warm worker.
+    configure_renderer(RenderSettings())
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fixtures_dir = args.fixtures or os.path.join(tmp, "fixtures")
+        os.makedirs(fixtures_dir, exist_ok=True)
+        output_dir = os.path.join(tmp, "output")
+        os.makedirs(output_dir)
+
+        results = bench_single_images(fixtures_dir, output_dir, args.repeat)
+        counts = [int(count) for count in args.counts.split(",") if count]
+        results.update(bench_batches(fixtures_dir, output_dir, counts, args.repeat))
+
+    # Batches render on every CPU, so they only compare against same-sized machines
+    finish(results, args, parallel=[name for name in results if name.startswith("generate_images_async")])
+
+
+if __name__ == "__main__":
+    main()
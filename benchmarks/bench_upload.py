@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Benchmark uploading rendered images to R2.
+
+Times TikTokUploader.upload_images_to_r2 for batches of rendered-size JPEGs.
+By default the bucket is moto's in-process S3 mock, which measures the
+client side (hashing, request signing, the upload thread pool) without
+network latency. Pass --endpoint-url to run against a MinIO or other
+S3-compatible server instead, using the CLOUDFLARE_R2_* credentials from
+the environment.
+
+moto comes with the bench extra: pip install -e ".[bench]"
+
+Usage:
+    python benchmarks/bench_upload.py [--counts 10,50] [--repeat 5] [--endpoint-url URL] [--save-baseline]
+"""
+
+import os
+import sys
+import atexit
+import shutil
+import argparse
+import tempfile
+import contextlib
+
+from common import PROJECT_ROOT, add_baseline_args, finish, measure
+
+# Keep the benchmark's upload manifest and tokens out of the project cache
+os.environ["LEVIBES_CACHE_DIR"] = tempfile.mkdtemp(prefix="levibes-bench-")
+atexit.register(shutil.rmtree, os.environ["LEVIBES_CACHE_DIR"], True)
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from PIL import Image  # noqa: E402
+from src.levibes.config import DEFAULT_IMAGE_SIZE  # noqa: E402
+from src.levibes.utils.logger import set_quiet  # noqa: E402
+
+MOCK_ENDPOINT = "https://bench.r2.example.com"
+MOCK_BUCKET = "levibes-bench"
+
+
+def create_fixtures(directory, count):
+    """Write rendered-size JPEGs of distinct content."""
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"captioned_{i:03d}.jpg")
+        if not os.path.exists(path):
+            bands = [Image.effect_noise(DEFAULT_IMAGE_SIZE, 30 + i % 30) for _ in range(3)]
+            Image.merge("RGB", bands).save(path, "JPEG", quality=90)
+        paths.append(path)
+    return paths
+
+
+def mock_bucket():
+    """Point the R2 settings at moto's S3 mock and return the context that enables it."""
+    try:
+        from moto import mock_aws
+    except ImportError:
+        sys.exit('The S3 mock needs moto: pip install -e ".[bench]" (or pass --endpoint-url)')
+
+    os.environ["MOTO_S3_CUSTOM_ENDPOINTS"] = MOCK_ENDPOINT
+    os.environ.update({
+        "CLOUDFLARE_R2_ENDPOINT_URL": MOCK_ENDPOINT,
+        "CLOUDFLARE_R2_ACCESS_KEY_ID": "bench",
+        "CLOUDFLARE_R2_SECRET_ACCESS_KEY": "bench",
+        "CLOUDFLARE_R2_BUCKET_NAME": MOCK_BUCKET,
+    })
+    return mock_aws()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--counts", default="10,50", help="Images per upload batch (default: 10,50)")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per batch size (default: 5)")
+    parser.add_argument("--endpoint-url", help="S3-compatible server to upload to instead of moto")
+    add_baseline_args(parser)
+    args = parser.parse_args()
+
+    set_quiet(True)
+    if args.endpoint_url:
+        os.environ["CLOUDFLARE_R2_ENDPOINT_URL"] = args.endpoint_url
+        context = contextlib.nullcontext()
+    else:
+        context = mock_bucket()
+
+    counts = [int(count) for count in args.counts.split(",") if count]
+    results = {}
+    with context, tempfile.TemporaryDirectory() as tmp:
+        from src.levibes.upload import TikTokUploader, UploadManifest
+
+        uploader = TikTokUploader("bench-client", "bench-secret")
+        r2 = uploader.r2_uploader
+        if not args.endpoint_url:
+            r2.client.create_bucket(Bucket=MOCK_BUCKET)
+        paths = create_fixtures(tmp, max(counts))
+
+        for count in counts:
+            def upload():
+                # Forget earlier uploads so content addressing doesn't skip them
+                r2.manifest = UploadManifest()
+                uploader.upload_images_to_r2(paths[:count])
+
+            label = "moto" if not args.endpoint_url else "endpoint"
+            results[f"upload_images_to_r2[{count},{label}]"] = measure(upload, args.repeat)
+
+    # Numbers from a real server depend on the network, so only moto runs are baselined
+    if args.endpoint_url:
+        args.save_baseline = False
+    finish(results, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Check that a render-only run doesn't import the network SDKs.
+
+Runs main.py with captions from a file and no upload under -X importtime,
+fails if any of the upload or OpenAI dependencies were imported, and prints
+the slowest top-level imports. Also imports the modules main.py defers
+directly, so a module-level SDK import in one of them fails the check even
+if nothing imports it at startup yet.
+
+Usage:
+    python benchmarks/check_imports.py [--top 15]
+"""
+
+import os
+import sys
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+# Only needed to caption with OpenAI or upload to R2/TikTok
+FORBIDDEN = [
+    "flask",
+    "werkzeug",
+    "boto3",
+    "botocore",
+    "cryptography",
+    "requests",
+    "openai",
+    "pydantic",
+    "httpx",
+]
+
+# Must stay importable without the SDKs; they load them when a request is made
+LAZY_MODULES = [
+    "src.levibes.caption_generation",
+    "src.levibes.caption_pool",
+    "src.levibes.batch",
+    "src.levibes.serve",
+]
+
+
+def create_fixtures(directory, count):
+    """Write small source images and a caption file for a render-only run."""
+    from PIL import Image
+
+    images_dir = os.path.join(directory, "images")
+    os.makedirs(images_dir)
+    for i in range(count):
+        Image.new("RGB", (640, 800), (40 * i % 255, 90, 160)).save(os.path.join(images_dir, f"image_{i}.jpg"))
+
+    caption_file = os.path.join(directory, "captions.txt")
+    with open(caption_file, "w", encoding="utf-8") as f:
+        f.write("\n".join(f"caption number {i}" for i in range(count)))
+    return images_dir, caption_file
+
+
+def parse_importtime(stderr):
+    """Return (cumulative microseconds, module) for each line of -X importtime output."""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line[len("import time:"):].split("|", 2)
+        imports.append((int(cumulative), module.rstrip()))
+    return imports
+
+
+def check_lazy_modules():
+    """Import each lazy module in a fresh interpreter and return the forbidden modules each loads."""
+    loaded = {}
+    for module in LAZY_MODULES:
+        code = (
+            f"import sys, importlib; importlib.import_module({module!r}); "
+            "print(' '.join(sorted({name.split('.')[0] for name in sys.modules})))"
+        )
+        result = subprocess.run([sys.executable, "-c", code], cwd=PROJECT_ROOT, capture_output=True, text=True)
+        if result.returncode != 0:
+            sys.exit(f"Importing {module} failed:\n{result.stderr}")
+        found = [name for name in FORBIDDEN if name in result.stdout.split()]
+        if found:
+            loaded[module] = found
+    return loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, default=15, help="Number of slowest imports to print (default: 15)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        images_dir, caption_file = create_fixtures(tmp, 2)
+        command = [
+            sys.executable, "-X", "importtime", str(PROJECT_ROOT / "main.py"),
+            "-s", "file", "-c", caption_file, "-n", "2",
+            "-i", images_dir, "-o", os.path.join(tmp, "output"), "--no-confirm",
+        ]
+        result = subprocess.run(command, cwd=PROJECT_ROOT, capture_output=True, text=True, stdin=subprocess.DEVNULL)
+
+    if result.returncode != 0:
+        print(result.stdout + result.stderr, file=sys.stderr)
+        sys.exit(f"Render-only run failed with exit code {result.returncode}")
+
+    imports = parse_importtime(result.stderr)
+    top_level = [(us, module.strip()) for us, module in imports if not module.startswith("  ")]
+    print(f"{'module':<40}{'cumulative ms':>14}")
+    for us, module in sorted(top_level, reverse=True)[:args.top]:
+        print(f"{module:<40}{us / 1000:>14.1f}")
+    print(f"{'total':<40}{sum(us for us, _ in top_level) / 1000:>14.1f}")
+
+    imported = {module.strip().split(".")[0] for _, module in imports}
+    found = [name for name in FORBIDDEN if name in imported]
+    if found:
+        sys.exit(f"Render-only run imported: {', '.join(found)}")
+
+    loaded = check_lazy_modules()
+    if loaded:
+        sys.exit("\n".join(f"Importing {module} imported: {', '.join(found)}" for module, found in loaded.items()))
+    print("No upload or OpenAI dependencies imported")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Each benchmark produces a mapping of case name to median seconds. Results
+are compared against the committed numbers in benchmarks/baseline.json, and
+a case more than --tolerance times slower than its baseline fails the run.
+Cases that spread work over all CPUs are only compared when the baseline
+was recorded with the same CPU count.
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import statistics
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+BASELINE_PATH = Path(__file__).resolve().parent / "baseline.json"
+DEFAULT_TOLERANCE = 1.3
+
+
+def add_baseline_args(parser):
+    """Add the --save-baseline and --tolerance options to a benchmark's parser."""
+    parser.add_argument("--save-baseline", action="store_true",
+                        help=f"Record these results in {BASELINE_PATH.name} instead of comparing against it")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help=f"Fail when a case is this many times slower than its baseline (default: {DEFAULT_TOLERANCE})")
+
+
+def measure(func, repeat):
+    """Call func once to warm up, then return the median seconds of repeat calls."""
+    func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def load_baseline():
+    """Return the committed baseline file, or an empty one."""
+    try:
+        return json.loads(BASELINE_PATH.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {"machine": {}, "results": {}}
+
+
+def machine_info():
+    """Describe the machine the numbers were taken on."""
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def finish(results, args, parallel=()):
+    """
+    Print results next to their baselines, then save or check them.
+
+    Exits with status 1 when any case regressed beyond the tolerance.
+
+    Args:
+        results: Median seconds per case
+        args: Parsed arguments with the baseline options
+        parallel: Cases whose time depends on the CPU count
+    """
+    baseline = load_baseline()
+    previous = baseline["results"]
+    baseline_cpus = baseline["machine"].get("cpus")
+    same_cpus = baseline_cpus == os.cpu_count()
+
+    print(f"{'case':<52}{'ms':>10}{'baseline':>10}{'ratio':>8}")
+    regressions = []
+    for name, seconds in results.items():
+        line = f"{name:<52}{seconds * 1000:>10.1f}"
+        if name in parallel and not same_cpus:
+            line += f"  (not compared: baseline from {baseline_cpus} CPUs, this machine has {os.cpu_count()})"
+        elif name in previous:
+            ratio = seconds / previous[name]
+            line += f"{previous[name] * 1000:>10.1f}{ratio:>8.2f}"
+            if ratio > args.tolerance:
+                regressions.append(name)
+        print(line)
+
+    if args.save_baseline:
+        previous.update(results)
+        baseline["machine"] = machine_info()
+        BASELINE_PATH.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+        print(f"Saved {len(results)} results to {BASELINE_PATH}")
+        return
+
+    if regressions:
+        sys.exit(f"{len(regressions)} cases slower than {args.tolerance}x baseline: {', '.join(regressions)}")
@@ -6,6 +6,9 @@ Entry point for the application.
 
 import os
 import sys
+import time
+import atexit
+from concurrent.futures import Future
 from dotenv import load_dotenv
 import gratient
 from src.levibes.cli import (
@@ -19,19 +22,35 @@ from src.levibes.cli import (
     ask_tiktok_caption,
     confirm_tiktok_upload,
 )
-from src.levibes.caption_generation import (
-    generate_captions,
-    generate_tiktok_captions,
-    read_captions_from_file,
+from src.levibes import metrics
+from src.levibes.caption_library import CaptionLibrary
+from src.levibes.caption_pool import CaptionPool
+from src.levibes.generate_images import (
+    RenderSettings,
+    generate_images,
+    render_cache_info,
+    warm_source_cache,
 )
-from src.levibes.generate_images import generate_images
 from src.levibes.utils.file_helpers import (
     create_unique_output_dir,
     ensure_directory_exists,
+    read_captions_from_file,
+)
+from src.levibes.config import (
+    JOB_POLL_INTERVAL,
+    RESPONSE_CACHE_DIR,
+    SOURCE_CACHE_DIR,
+    load_cli_args,
+    load_serve_args,
+    load_submit_args,
+    load_warm_cache_args,
 )
-from src.levibes.config import load_cli_args
-from src.levibes.upload import upload_to_tiktok, validate_tiktok_env, TikTokUploadError
+from src.levibes.response_cache import configure_response_cache
 from src.levibes.utils.logger import logger, set_quiet
+from src.levibes.utils.timing import add_stats, enable_profiling, span, timings
+
+# OpenAI, pydantic, boto3, Flask, requests and cryptography are imported
+# where they are first needed, so runs that only render skip their import time
 
 
 def validate_cli_args(args):
@@ -88,14 +107,46 @@ def validate_cli_args(args):
                 logger.error(f"Images directory only contains {len(image_files)} images, but {args.num_images} images requested")
                 return False
     
+    if args.posts <= 0:
+        logger.error("Number of posts must be positive")
+        return False
+    
+    if args.manifest and not os.path.isfile(args.manifest):
+        logger.error(f"Manifest '{args.manifest}' does not exist")
+        return False
+    
     # Validate num_images is positive
     if args.num_images is not None and args.num_images <= 0:
         logger.error("Number of images must be positive")
         return False
     
+    # Validate output quality
+    if not 1 <= args.quality <= 100:
+        logger.error("Quality must be between 1 and 100")
+        return False
+    
+    # Validate worker count is positive
+    if args.workers is not None and args.workers <= 0:
+        logger.error("Number of workers must be positive")
+        return False
+    
+    if args.upload_concurrency <= 0:
+        logger.error("Upload concurrency must be positive")
+        return False
+    
+    # Streaming uploads happen during rendering, so they need upload enabled up front
+    if args.stream_upload and not args.upload_tiktok:
+        logger.error("--stream-upload requires --upload-tiktok")
+        return False
+    
+    if args.no_save and not args.stream_upload:
+        logger.error("--no-save requires --stream-upload")
+        return False
+    
     # If TikTok upload is enabled, validate environment variables
     if args.upload_tiktok:
         try:
+            from src.levibes.upload import validate_tiktok_env
             validate_tiktok_env()
         except ImportError:
             logger.error("TikTok upload module not available")
@@ -108,10 +159,142 @@ def validate_cli_args(args):
     return True
 
 
+def warm_cache(argv):
+    """Entry point for the warm-cache command."""
+    args = load_warm_cache_args(argv)
+    
+    if not os.path.isdir(args.images_dir):
+        logger.error(f"Images directory '{args.images_dir}' does not exist")
+        sys.exit(1)
+    
+    settings = RenderSettings(
+        source_cache_dir=str(SOURCE_CACHE_DIR),
+        source_cache_max_bytes=args.source_cache_max_bytes,
+        resample=args.resample,
+        jpeg_draft=args.jpeg_draft,
+    )
+    warm_source_cache(args.images_dir, args.workers, args.executor, settings)
+
+
+def serve(argv):
+    """Entry point for the serve command."""
+    args = load_serve_args(argv)
+    
+    if args.concurrency <= 0:
+        logger.error("Concurrency must be positive")
+        sys.exit(1)
+    
+    if args.poll_interval <= 0:
+        logger.error("Poll interval must be positive")
+        sys.exit(1)
+    
+    if args.workers is not None and args.workers <= 0:
+        logger.error("Number of workers must be positive")
+        sys.exit(1)
+    
+    if args.upload_concurrency <= 0:
+        logger.error("Upload concurrency must be positive")
+        sys.exit(1)
+    
+    if not 1 <= args.quality <= 100:
+        logger.error("Quality must be between 1 and 100")
+        sys.exit(1)
+    
+    if not os.path.isdir(args.images_dir):
+        logger.error(f"Images directory '{args.images_dir}' does not exist")
+        sys.exit(1)
+    
+    from src.levibes.serve import run_server
+    run_server(args)
+
+
+def submit(argv):
+    """Entry point for the submit command."""
+    args = load_submit_args(argv)
+    from src.levibes.job_queue import JobQueue
+    queue = JobQueue(args.queue)
+    
+    if args.list:
+        for job in queue.recent():
+            print(job.describe())
+        return
+    
+    if args.caption_source == "file" and not args.caption_file:
+        logger.error("--caption-file is required when using --caption-source file")
+        sys.exit(1)
+    
+    if args.num_images is not None and args.num_images <= 0:
+        logger.error("Number of images must be positive")
+        sys.exit(1)
+    
+    # The daemon has its own working directory, so paths are made absolute
+    spec = {
+        "num_images": args.num_images,
+        "caption_source": args.caption_source or ("file" if args.caption_file else None),
+        "language": args.language,
+        "model": args.model,
+        "images_dir": os.path.abspath(args.images_dir) if args.images_dir else None,
+        "caption_file": os.path.abspath(args.caption_file) if args.caption_file else None,
+    }
+    spec = {key: value for key, value in spec.items() if value is not None}
+    spec["upload"] = args.upload
+    
+    if spec.get("caption_file") and not os.path.isfile(spec["caption_file"]):
+        logger.error(f"Caption file '{args.caption_file}' does not exist")
+        sys.exit(1)
+    
+    if spec.get("images_dir") and not os.path.isdir(spec["images_dir"]):
+        logger.error(f"Images directory '{args.images_dir}' does not exist")
+        sys.exit(1)
+    
+    job_id = queue.submit(spec)
+    logger.success(f"Queued job {job_id}")
+    
+    if args.wait:
+        job = queue.get(job_id)
+        while job and job.status in ("queued", "running"):
+            time.sleep(JOB_POLL_INTERVAL)
+            job = queue.get(job_id)
+        print(job.describe())  # type: ignore
+        if job.status == "failed":  # type: ignore
+            sys.exit(1)
+
+
+def batch(args):
+    """Generate several posts in one run."""
+    from src.levibes.batch import posts_from_args, run_batch
+    
+    try:
+        posts = posts_from_args(args)
+    except (OSError, ValueError) as e:
+        logger.error(f"Invalid manifest: {e}")
+        sys.exit(1)
+    
+    needs_openai = any(post.caption_source == "ai" and not post.captions for post in posts)
+    if needs_openai and not args.replay and not os.environ.get("OPENAI_API_KEY"):
+        logger.error("OPENAI_API_KEY is not set in your .env file")
+        sys.exit(1)
+    
+    results = run_batch(posts, args)
+    if any(result.error for result in results):
+        sys.exit(1)
+
+
 def main():
     """Main application entry point."""
     load_dotenv()
     
+    # Subcommands
+    if len(sys.argv) > 1 and sys.argv[1] == "warm-cache":
+        warm_cache(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        serve(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "submit":
+        submit(sys.argv[2:])
+        return
+    
     # Load CLI arguments
     args = load_cli_args()
     
@@ -122,14 +305,37 @@ def main():
     # Validate CLI arguments
     if not validate_cli_args(args):
         sys.exit(1)
+    
+    if args.response_cache or args.replay:
+        response_cache = configure_response_cache(
+            str(RESPONSE_CACHE_DIR), args.response_cache_ttl, replay=args.replay
+        )
+        atexit.register(response_cache.evict)  # type: ignore
+
+    if args.timing_report or args.profile:
+        if args.profile:
+            enable_profiling(args.profile)
+        add_stats("render", render_cache_info)
+        # Written at exit so early exits and batch failures are still reported
+        atexit.register(timings.write_report, args.timing_report or os.path.join(args.profile, "report.json"))
+
+    if args.metrics_port:
+        metrics.registry.start_http_server(args.metrics_port)
+    if args.metrics_textfile:
+        atexit.register(metrics.registry.write_textfile, args.metrics_textfile)
 
     display_welcome()
 
+    # Batch mode runs every post non-interactively in one process
+    if args.manifest or args.posts > 1:
+        batch(args)
+        return
+
     # Ask user to choose caption source (or use CLI arg)
     caption_source = ask_caption_source(args.caption_source)
 
     # Only check for OpenAI API key if user chooses AI
-    if caption_source == "ai" and not os.environ.get("OPENAI_API_KEY"):
+    if caption_source == "ai" and not args.replay and not os.environ.get("OPENAI_API_KEY"):
         logger.error("OPENAI_API_KEY is not set in your .env file")
         sys.exit(1)
 
@@ -139,12 +345,33 @@ def main():
     )
 
     captions = []
+    caption_library = CaptionLibrary() if args.caption_library else None
+
+    # The TikTok caption doesn't depend on the slides, so when it is going to
+    # be generated anyway, request it now to overlap with captions and rendering
+    if caption_source == "ai":
+        from src.levibes.caption_generation import request_post_captions, request_tiktok_captions
+
+    auto_tiktok_caption = caption_source == "ai" and args.upload_tiktok and not args.no_tiktok
+    tiktok_caption_future = None
+    if auto_tiktok_caption and not args.combined_captions:
+        tiktok_caption_future = request_tiktok_captions(1, args.model, args.language)
 
     if caption_source == "ai":
+        caption_pool = CaptionPool(args.model, args.language, library=caption_library)
         # AI-generated captions with confirmation loop
         while True:
             try:
-                ai_captions = generate_captions(num_images, args.model, args.language)
+                if auto_tiktok_caption and args.combined_captions:
+                    # One call returns both; keep the TikTok caption for after rendering
+                    with span("captions", profile=True):
+                        ai_captions, tiktok_caption = request_post_captions(num_images, args.model, args.language, caption_pool).result()
+                    tiktok_caption_future = Future()
+                    tiktok_caption_future.set_result(tiktok_caption)
+                else:
+                    # Rejected sets are replaced from the pool's leftovers before asking again
+                    with span("captions", profile=True):
+                        ai_captions = caption_pool.take(num_images)
                 
                 if confirm_captions(ai_captions, args.no_confirm):
                     captions.extend(ai_captions)
@@ -162,7 +389,8 @@ def main():
         while True:
             caption_file_path = get_caption_file_path(num_images, args.caption_file)
             try:
-                captions = read_captions_from_file(caption_file_path, num_images)
+                with span("captions", profile=True):
+                    captions = read_captions_from_file(caption_file_path, num_images)
                 if confirm_captions(captions, args.no_confirm):
                     break
                 else:
@@ -179,15 +407,53 @@ def main():
         logger.error("No captions were generated. Please try again.")
         return
 
-    ensure_directory_exists(output_dir)
-    unique_output_dir = create_unique_output_dir(output_dir)
+    unique_output_dir = None
+    if not args.no_save:
+        ensure_directory_exists(output_dir)
+        unique_output_dir = create_unique_output_dir(output_dir)
 
-    try:
-        generate_images(captions, path_to_images, unique_output_dir)
-        display_success(unique_output_dir)
-    except Exception as e:
-        logger.error(f"Failed to generate images: {e}")
-        return
+    image_urls = None
+    if args.stream_upload:
+        # Render straight into memory and upload while rendering
+        from src.levibes.pipeline import stream_render_to_r2
+        from src.levibes.upload import validate_r2_env
+        try:
+            validate_r2_env()
+            with span("render", profile=True):
+                image_urls = stream_render_to_r2(
+                    captions,
+                    path_to_images,
+                    unique_output_dir,
+                    args.outro_image,
+                    args.workers,
+                    args.executor,
+                    RenderSettings.from_args(args),
+                    args.upload_concurrency,
+                    args.verify_uploads,
+                )
+            if unique_output_dir:
+                display_success(unique_output_dir)
+        except Exception as e:
+            logger.error(f"Failed to generate and upload images: {e}")
+            return
+    else:
+        try:
+            with span("render", profile=True):
+                generate_images(
+                    captions,
+                    path_to_images,
+                    unique_output_dir,
+                    args.workers,
+                    args.executor,
+                    RenderSettings.from_args(args),
+                )
+            display_success(unique_output_dir)
+        except Exception as e:
+            logger.error(f"Failed to generate images: {e}")
+            return
+
+    if caption_library:
+        caption_library.mark_used(captions, args.language, args.model if caption_source == "ai" else None)
 
     # TikTok caption generation (only available with AI)
     tiktok_caption_data = None
@@ -195,7 +461,11 @@ def main():
         if args.no_confirm:
             # Skip confirmation when no_confirm is True
             try:
-                tiktok_caption_data = generate_tiktok_captions(1, args.model, args.language)
+                # Use the prefetched caption first; retries request a new one
+                tiktok_caption_request = tiktok_caption_future or request_tiktok_captions(1, args.model, args.language)
+                tiktok_caption_future = None
+                with span("captions.tiktok"):
+                    tiktok_caption_data = tiktok_caption_request.result()
                 display_caption = f"{tiktok_caption_data.title} {' '.join(f'#{tag}' for tag in tiktok_caption_data.hashtags)}"
                 confirm_captions(display_caption, args.no_confirm)  # This will auto-confirm and display
             except Exception as e:
@@ -204,7 +474,11 @@ def main():
             # Normal confirmation flow
             while True:
                 try:
-                    tiktok_caption_data = generate_tiktok_captions(1, args.model, args.language)
+                    # Use the prefetched caption first; retries request a new one
+                    tiktok_caption_request = tiktok_caption_future or request_tiktok_captions(1, args.model, args.language)
+                    tiktok_caption_future = None
+                    with span("captions.tiktok"):
+                        tiktok_caption_data = tiktok_caption_request.result()
                     # Display the structured caption for confirmation
                     display_caption = f"{tiktok_caption_data.title} {' '.join(f'#{tag}' for tag in tiktok_caption_data.hashtags)}"
                     if confirm_captions(display_caption, args.no_confirm):
@@ -221,6 +495,8 @@ def main():
 
     # TikTok upload functionality
     if confirm_tiktok_upload(args.upload_tiktok):
+        from src.levibes.upload import TikTokUploadError, upload_to_tiktok, validate_tiktok_env
+        
         # Validate TikTok environment variables
         try:
             validate_tiktok_env()
@@ -232,10 +508,21 @@ def main():
             upload_caption_data = tiktok_caption_data if tiktok_caption_data else (captions[0] if captions else "")
             
             # Upload to TikTok (always as draft)
-            success = upload_to_tiktok(unique_output_dir, upload_caption_data, args.outro_image)
+            with span("upload", profile=True):
+                success = upload_to_tiktok(
+                    unique_output_dir,
+                    upload_caption_data,
+                    args.outro_image,
+                    image_urls,
+                    args.upload_concurrency,
+                    args.wait_status,
+                    args.verify_uploads,
+                )
             
-            if not success:
+            if not success and unique_output_dir:
                 logger.warning("TikTok upload failed. Images are still saved locally.")
+            elif not success:
+                logger.warning("TikTok upload failed.")
 
     # Simple closing message with minimal gradient
     print("\n" + gratient.blue("Thank you for using LeVibes!"))
@@ -0,0 +1,406 @@
+"""
+Batch mode: generate many carousels in one process
+
+Captions for the next post are generated while the current one renders, and
+each finished post is uploaded while the next one renders. The OpenAI client,
+font and layout caches, source image listing, R2 client and TikTok token are
+shared by every post in the batch.
+"""
+
+import os
+import json
+import time
+import asyncio
+from dataclasses import dataclass, field, fields
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+from .caption_library import CaptionLibrary
+from .caption_pool import CaptionPool
+from .config import (
+    BATCH_PREFETCH,
+    DEFAULT_IMAGES_DIR,
+    DEFAULT_NUM_IMAGES,
+    DEFAULT_OUTPUT_DIR,
+    OPENAI_MODEL,
+)
+from .generate_images import RenderSettings, generate_images_async
+from .response_cache import response_scope
+from .sources import list_source_images
+from .utils.file_helpers import create_unique_output_dir, ensure_directory_exists
+from .utils.logger import logger
+from .utils.timing import post_scope, span
+
+if TYPE_CHECKING:
+    from .upload import TikTokUploader
+
+
+@dataclass
+class PostSpec:
+    """What to generate for one post in a batch"""
+
+    num_images: int = DEFAULT_NUM_IMAGES
+    caption_source: str = "ai"  # "ai" or "file"
+    language: str = "english"
+    model: str = OPENAI_MODEL
+    images_dir: str = DEFAULT_IMAGES_DIR
+    caption_file: Optional[str] = None
+    captions: Optional[List[str]] = None  # fixed captions, skipping generation
+    title: Optional[str] = None
+    hashtags: Optional[List[str]] = None
+
+
+@dataclass
+class PostResult:
+    """Outcome of one post in a batch"""
+
+    index: int
+    output_dir: Optional[str] = None
+    image_urls: List[str] = field(default_factory=list)
+    publish_id: Optional[str] = None
+    error: Optional[str] = None
+    elapsed: float = 0.0
+
+
+def post_from_dict(data: Dict[str, Any], defaults: PostSpec) -> PostSpec:
+    """
+    Build a post spec from a manifest or job entry.
+
+    Args:
+        data: PostSpec fields to set
+        defaults: Post spec supplying every field left out
+
+    Returns:
+        The post spec
+
+    Raises:
+        ValueError: If data has fields PostSpec doesn't
+    """
+    allowed = {f.name for f in fields(PostSpec)}
+    unknown = set(data) - allowed
+    if unknown:
+        raise ValueError(f"unknown fields: {', '.join(sorted(unknown))}")
+    values = {name: getattr(defaults, name) for name in allowed}
+    values.update(data)
+    if values.get("captions"):
+        values["caption_source"] = "file"
+        values["num_images"] = len(values["captions"])
+    return PostSpec(**values)
+
+
+def load_manifest(path: str, defaults: PostSpec) -> List[PostSpec]:
+    """
+    Load post specs from a JSON manifest.
+
+    The manifest is either a list of post objects or an object with a "posts"
+    list. Each post may set any PostSpec field; missing fields fall back to
+    the CLI defaults.
+
+    Args:
+        path: Path to the manifest file
+        defaults: Post spec built from the CLI arguments
+
+    Returns:
+        List of post specs, in manifest order
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    posts = data.get("posts", []) if isinstance(data, dict) else data
+    if not isinstance(posts, list) or not posts:
+        raise ValueError(f"Manifest {path} does not contain any posts")
+
+    specs = []
+    for i, post in enumerate(posts):
+        try:
+            specs.append(post_from_dict(post, defaults))
+        except ValueError as e:
+            raise ValueError(f"Post {i + 1} in {path} has {e}") from e
+    return specs
+
+
+def posts_from_args(args) -> List[PostSpec]:
+    """
+    Build the post specs for a batch from CLI arguments.
+
+    Args:
+        args: Parsed CLI arguments
+
+    Returns:
+        One post spec per post, from --manifest or repeated --posts times
+    """
+    defaults = PostSpec(
+        num_images=args.num_images or DEFAULT_NUM_IMAGES,
+        caption_source=args.caption_source or ("file" if args.caption_file else "ai"),
+        language=args.language,
+        model=args.model,
+        images_dir=args.images_dir or DEFAULT_IMAGES_DIR,
+        caption_file=args.caption_file,
+    )
+    if args.manifest:
+        return load_manifest(args.manifest, defaults)
+    return [defaults] * args.posts
+
+
+class CaptionFiles:
+    """Hands out consecutive captions from caption files so posts don't repeat them"""
+
+    def __init__(self):
+        self._captions: Dict[str, List[str]] = {}
+        self._offsets: Dict[str, int] = {}
+        self._modified: Dict[str, int] = {}
+
+    def take(self, path: str, count: int) -> List[str]:
+        # Read again if the file changed, e.g. captions appended while serving
+        modified = os.stat(path).st_mtime_ns
+        if self._modified.get(path) != modified:
+            with open(path, "r", encoding="utf-8") as f:
+                self._captions[path] = [line.strip() for line in f if line.strip()]
+            self._offsets.setdefault(path, 0)
+            self._modified[path] = modified
+
+        offset = self._offsets[path]
+        captions = self._captions[path][offset:offset + count]
+        if len(captions) < count:
+            raise ValueError(
+                f"Not enough captions left in {path}. Found {len(captions)}, need {count}"
+            )
+        self._offsets[path] = offset + count
+        return captions
+
+
+class BatchState:
+    """
+    State shared by every post generated in one process.
+
+    Leftover captions from one post's request are used by the next, posts
+    reading the same caption file take consecutive lines, and source
+    directories are only listed again when their contents change.
+    """
+
+    def __init__(self, caption_library: bool = False):
+        self.caption_files = CaptionFiles()
+        self.caption_pools: Dict[Tuple[str, str], CaptionPool] = {}
+        self.image_lists: Dict[str, Tuple[int, List[str]]] = {}
+        self.caption_library = CaptionLibrary() if caption_library else None
+
+    def caption_pool(self, model: str, language: str) -> CaptionPool:
+        """Get the caption pool for a model and language"""
+        key = (model, language)
+        if key not in self.caption_pools:
+            self.caption_pools[key] = CaptionPool(model, language, library=self.caption_library)
+        return self.caption_pools[key]
+
+    def image_list(self, images_dir: str) -> List[str]:
+        """Get the source images in a directory, listing it again only when it has changed"""
+        modified = os.stat(images_dir).st_mtime_ns
+        cached = self.image_lists.get(images_dir)
+        if cached is None or cached[0] != modified:
+            cached = self.image_lists[images_dir] = (modified, list_source_images(images_dir))
+        return cached[1]
+
+
+async def run_batch_async(posts: List[PostSpec], args, uploader: Optional["TikTokUploader"] = None, state: Optional[BatchState] = None) -> List[PostResult]:
+    """
+    Generate, render and optionally upload a batch of posts.
+
+    Captions, rendering and uploading run as three pipelined stages, so at
+    any time one post can be captioned, one rendered and one uploaded.
+
+    Args:
+        posts: Post specs to generate
+        args: Parsed CLI arguments with the render and upload options
+        uploader: Authenticated TikTok uploader (None to only render)
+        state: State to share with other batches (a new one by default)
+
+    Returns:
+        PostResult for each post, in order
+    """
+    # The OpenAI and TikTok/R2 clients are only imported when a post needs them
+    if any(not post.captions and post.caption_source == "ai" for post in posts):
+        from .caption_generation import request_post_captions, request_tiktok_captions
+    if uploader is not None:
+        from .pipeline import stream_render_to_r2_async
+        from .upload import caption_title_and_hashtags, get_image_files
+
+    settings = RenderSettings.from_args(args)
+    results = [PostResult(index) for index in range(len(posts))]
+    state = state or BatchState(args.caption_library)
+    caption_library = state.caption_library
+
+    caption_queue: asyncio.Queue = asyncio.Queue(maxsize=BATCH_PREFETCH)
+    upload_queue: asyncio.Queue = asyncio.Queue(maxsize=BATCH_PREFETCH)
+
+    def fail(index: int, stage: str, error: Exception) -> None:
+        results[index].error = f"{stage}: {error}"
+        logger.error(f"{stage} failed: {error}", prefix=f"post {index + 1}")
+
+    async def caption_stage():
+        for index, post in enumerate(posts):
+            start_time = time.perf_counter()
+            try:
+                with post_scope(index + 1), span("captions", profile=True):
+                    use_ai = not post.captions and post.caption_source == "ai"
+                    want_tiktok = uploader is not None and use_ai and post.title is None and not args.no_tiktok
+
+                    tiktok_caption: Any = None
+                    if want_tiktok and args.combined_captions:
+                        captions, tiktok_caption = await asyncio.wrap_future(
+                            request_post_captions(
+                                post.num_images, post.model, post.language, state.caption_pool(post.model, post.language)
+                            )
+                        )
+                    else:
+                        # Slide captions and the TikTok caption are requested concurrently
+                        tiktok_request = None
+                        if want_tiktok:
+                            tiktok_request = request_tiktok_captions(1, post.model, post.language)
+
+                        if post.captions:
+                            captions = list(post.captions)
+                        elif post.caption_source == "file":
+                            captions = state.caption_files.take(post.caption_file, post.num_images)  # type: ignore
+                        else:
+                            captions = await asyncio.wrap_future(
+                                state.caption_pool(post.model, post.language).request(post.num_images)
+                            )
+
+                        if tiktok_request is not None:
+                            tiktok_caption = await asyncio.wrap_future(tiktok_request)
+            except Exception as e:
+                fail(index, "Captions", e)
+                continue
+
+            results[index].elapsed += time.perf_counter() - start_time
+            await caption_queue.put((index, post, captions, tiktok_caption))
+        await caption_queue.put(None)
+
+    async def render_stage():
+        while True:
+            item = await caption_queue.get()
+            if item is None:
+                break
+            index, post, captions, tiktok_caption = item
+            start_time = time.perf_counter()
+            logger.progress(f"Rendering {len(captions)} images for post {index + 1}")
+
+            output_dir = None
+            try:
+                with post_scope(index + 1), span("render", profile=True):
+                    image_paths = state.image_list(post.images_dir)
+
+                    if not args.no_save:
+                        ensure_directory_exists(args.output_dir or DEFAULT_OUTPUT_DIR)
+                        output_dir = create_unique_output_dir(args.output_dir or DEFAULT_OUTPUT_DIR)
+                    results[index].output_dir = output_dir
+
+                    image_urls = None
+                    if uploader and args.stream_upload:
+                        image_urls = await stream_render_to_r2_async(
+                            captions,
+                            post.images_dir,
+                            output_dir,
+                            args.outro_image,
+                            args.workers,
+                            args.executor,
+                            settings,
+                            uploader.r2_uploader,
+                            args.upload_concurrency,
+                            image_paths,
+                        )
+                    else:
+                        await generate_images_async(
+                            captions,
+                            post.images_dir,
+                            output_dir,
+                            args.workers,
+                            args.executor,
+                            settings,
+                            image_paths,
+                        )
+            except Exception as e:
+                fail(index, "Rendering", e)
+                continue
+
+            results[index].elapsed += time.perf_counter() - start_time
+            if caption_library:
+                caption_library.mark_used(captions, post.language, post.model if post.caption_source == "ai" else None)
+            if uploader:
+                await upload_queue.put((index, post, captions, output_dir, image_urls, tiktok_caption))
+            else:
+                logger.success(f"Saved images to {output_dir}", prefix=f"post {index + 1}")
+        await upload_queue.put(None)
+
+    def upload_post(post, captions, output_dir, image_urls, tiktok_caption):
+        if image_urls is None:
+            image_urls = uploader.upload_images_to_r2(get_image_files(output_dir, args.outro_image))  # type: ignore
+        if post.title is not None:
+            title, hashtags = post.title, post.hashtags
+        else:
+            title, hashtags = caption_title_and_hashtags(tiktok_caption or (captions[0] if captions else ""))
+        response = uploader.upload_photos_as_draft(image_urls, title, hashtags)  # type: ignore
+        return image_urls, response.get("data", {}).get("publish_id")
+
+    async def upload_stage():
+        while True:
+            item = await upload_queue.get()
+            if item is None:
+                break
+            index, post, captions, output_dir, image_urls, tiktok_caption = item
+            start_time = time.perf_counter()
+            try:
+                with post_scope(index + 1), span("upload", profile=True):
+                    results[index].image_urls, results[index].publish_id = await asyncio.to_thread(
+                        upload_post, post, captions, output_dir, image_urls, tiktok_caption
+                    )
+            except Exception as e:
+                fail(index, "Upload", e)
+                continue
+            results[index].elapsed += time.perf_counter() - start_time
+            logger.success("Uploaded to TikTok as draft", prefix=f"post {index + 1}")
+
+    # Cached responses are numbered per batch, so a batch run by the serve
+    # daemon uses the same cache entries as the same batch run on its own
+    with response_scope():
+        await asyncio.gather(caption_stage(), render_stage(), upload_stage())
+    return results
+
+
+def run_batch(posts: List[PostSpec], args) -> List[PostResult]:
+    """
+    Generate a batch of posts and log a summary.
+
+    Args:
+        posts: Post specs to generate
+        args: Parsed CLI arguments with the render and upload options
+
+    Returns:
+        PostResult for each post, in order
+    """
+    uploader = None
+    if args.upload_tiktok:
+        from .upload import TikTokUploader, validate_r2_env, validate_tiktok_env
+
+        client_id, client_secret = validate_tiktok_env()
+        validate_r2_env()
+        uploader = TikTokUploader(client_id, client_secret, args.upload_concurrency, verify_uploads=args.verify_uploads)
+        # Authenticate once up front so any browser login happens before the work starts
+        logger.progress("Authenticating with TikTok")
+        uploader.authenticate()
+
+    logger.progress(f"Generating {len(posts)} posts")
+    start_time = time.perf_counter()
+    results = asyncio.run(run_batch_async(posts, args, uploader))
+    wall_time = time.perf_counter() - start_time
+
+    publish_ids = [result.publish_id for result in results if result.publish_id]
+    if uploader and args.wait_status and publish_ids:
+        from .publish_status import wait_for_publish
+
+        wait_for_publish(uploader, publish_ids)
+
+    failed = sum(1 for result in results if result.error)
+    summary = f"Generated {len(results) - failed} of {len(results)} posts in {wall_time:.2f}s"
+    if failed:
+        logger.warning(summary)
+    else:
+        logger.success(summary)
+    return results
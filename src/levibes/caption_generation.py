@@ -3,107 +3,250 @@ Caption generation using OpenAI API
 """
 
 import os
-from openai import OpenAI
-from pydantic import BaseModel
+import time
+import atexit
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import TYPE_CHECKING, Tuple
+from . import metrics
+from .caption_pool import CaptionPool
 from .config import OPENAI_MODEL, OPENAI_TEMPERATURE
+from .response_cache import CacheMissError, get_response_cache
+from .utils.file_helpers import read_captions_from_file  # noqa: F401 (re-exported)
 from .utils.logger import logger
+from .utils.timing import span
 
+if TYPE_CHECKING:
+    from .caption_schemas import TikTokCaption
 
-class Captions(BaseModel):
-    captions: list[str]
+# The schemas need pydantic, so they are only imported once a request is made
+_SCHEMAS = ("Captions", "TikTokCaption", "PostCaptions")
 
 
-class TikTokCaption(BaseModel):
-    title: str
-    hashtags: list[str]
+def __getattr__(name):
+    if name in _SCHEMAS:
+        from . import caption_schemas
 
+        return getattr(caption_schemas, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-client = None
 
+class CaptionService:
+    """
+    AsyncOpenAI client running on a background event loop.
 
-def read_captions_from_file(file_path, num_images):
+    Requests are submitted from synchronous code and return futures, so
+    several caption calls can be in flight at once and callers can keep
+    working (e.g. rendering) while they complete. The client and its
+    connection pool live as long as the process.
     """
-    Read captions from a text file.
 
-    Args:
-        file_path (str): Path to the text file containing captions
-        num_images (int): Number of captions needed
+    def __init__(self, api_key=None):
+        api_key = api_key or os.getenv("OPENAI_API_KEY")
+        cache = get_response_cache()
+        if not api_key and cache is not None and cache.replay:
+            # Replays never reach the API, so no key is needed
+            api_key = "replay"
+        # Imported here so importing this module doesn't load the OpenAI SDK
+        from openai import AsyncOpenAI
+
+        self.client = AsyncOpenAI(api_key=api_key)
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="levibes-openai", daemon=True
+        )
+        self._thread.start()
 
-    Returns:
-        list: List of captions read from the file
+    def submit(self, coroutine) -> Future:
+        """Run a coroutine on the service loop and return its future."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+
+    def close(self):
+        """Close the client and stop the background loop."""
+        try:
+            self.submit(self.client.close()).result(timeout=5)
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+_service = None
+_service_lock = threading.Lock()
 
-    Raises:
-        FileNotFoundError: If the file doesn't exist
-        ValueError: If the file doesn't contain enough captions
+
+def get_caption_service():
+    """Get the process-wide caption service, creating it on first use."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = CaptionService()
+            atexit.register(_service.close)
+        return _service
+
+
+async def parse_response(client, model, prompt, text_format):
     """
-    if not os.path.exists(file_path):
-        raise FileNotFoundError(f"Caption file not found: {file_path}")
+    Request a structured response, going through the response cache when enabled.
 
-    with open(file_path, "r", encoding="utf-8") as file:
-        captions = [line.strip() for line in file if line.strip()]
+    Args:
+        client: AsyncOpenAI client
+        model: Model name
+        prompt: Full prompt text
+        text_format: Pydantic model describing the structured output
 
-    if len(captions) < num_images:
-        raise ValueError(
-            f"Not enough captions in file. Found {len(captions)}, need {num_images}"
-        )
+    Returns:
+        Parsed text_format instance, or None if the model returned nothing
+    """
+    cache = get_response_cache()
+    key = None
+    if cache is not None:
+        key = cache.key(model, OPENAI_TEMPERATURE, prompt, text_format.model_json_schema())
+        cached = cache.get(key)
+        if cached is not None:
+            logger.info("Using cached response", prefix="OpenAI")
+            return text_format.model_validate(cached)
+        if cache.replay:
+            raise CacheMissError(f"No cached {text_format.__name__} response for this request (replay mode)")
+
+    start_time = time.perf_counter()
+    try:
+        with span("openai.request"):
+            openai_response = await client.responses.parse(
+                model=model,
+                temperature=OPENAI_TEMPERATURE,
+                input=[{"role": "user", "content": prompt}],
+                text_format=text_format,
+            )
+    except Exception:
+        metrics.openai_requests.inc(model=model, outcome="error")
+        raise
+    metrics.openai_requests.inc(model=model, outcome="ok")
+    metrics.openai_seconds.observe(time.perf_counter() - start_time, model=model)
+    usage = getattr(openai_response, "usage", None)
+    if usage is not None:
+        metrics.openai_tokens.inc(usage.input_tokens or 0, model=model, kind="input")
+        metrics.openai_tokens.inc(usage.output_tokens or 0, model=model, kind="output")
 
-    return captions[:num_images]
+    parsed = openai_response.output_parsed
+    if parsed is not None and cache is not None:
+        cache.put(key, parsed.model_dump())
+    return parsed
 
 
-def generate_captions(num_images, model=OPENAI_MODEL, language='english'):
-    """Generate captions using OpenAI API"""
-    global client
-    if client is None:
-        client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+async def generate_captions_async(client, num_images, model=OPENAI_MODEL, language='english'):
+    """Generate captions with an AsyncOpenAI client"""
+    from .caption_schemas import Captions
 
     language_text = f" in {language}" if language.lower() != 'english' else ""
     logger.progress(f"Generating captions with {model}{language_text}")
     
     try:
-        openai_response = client.responses.parse(
-            model=model,
-            temperature=OPENAI_TEMPERATURE,
-            input=[{"role": "user", "content": generate_prompt(num_images, language)}],
-            text_format=Captions,
-        )
+        parsed = await parse_response(client, model, generate_prompt(num_images, language), Captions)
 
-        if openai_response.output_parsed is None:
+        if parsed is None:
             raise ValueError("No captions generated")
 
-        logger.success(f"Generated {len(openai_response.output_parsed.captions)} captions")
-        return openai_response.output_parsed.captions
+        logger.success(f"Generated {len(parsed.captions)} captions")
+        return parsed.captions
     except Exception as e:
         logger.error(f"Caption generation failed: {e}")
         raise
 
 
-def generate_tiktok_captions(num_captions=1, model=OPENAI_MODEL, language='english'):
-    """Generate TikTok captions using OpenAI API"""
-    global client
-    if client is None:
-        client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+async def generate_tiktok_captions_async(client, num_captions=1, model=OPENAI_MODEL, language='english'):
+    """Generate TikTok captions with an AsyncOpenAI client"""
+    from .caption_schemas import TikTokCaption
 
     language_text = f" in {language}" if language.lower() != 'english' else ""
     logger.progress(f"Generating TikTok captions with {model}{language_text}")
     
     try:
-        openai_response = client.responses.parse(
-            model=model,
-            temperature=OPENAI_TEMPERATURE,
-            input=[{"role": "user", "content": generate_tiktok_prompt(num_captions, language)}],
-            text_format=TikTokCaption,
-        )
+        parsed = await parse_response(client, model, generate_tiktok_prompt(num_captions, language), TikTokCaption)
 
-        if openai_response.output_parsed is None:
+        if parsed is None:
             raise ValueError("No TikTok captions generated")
 
         logger.success("Generated TikTok caption")
-        return openai_response.output_parsed
+        return parsed
     except Exception as e:
         logger.error(f"TikTok caption generation failed: {e}")
         raise
 
 
+async def generate_post_captions_async(client, num_images, model=OPENAI_MODEL, language='english', pool=None) -> Tuple[list, "TikTokCaption"]:
+    """
+    Generate slide captions and the TikTok caption in a single call.
+
+    Slide captions go through a caption pool, so they are validated and (with
+    a caption library) checked against recently used captions like any other
+    generated caption. Falls back to separate (concurrent) caption and TikTok
+    caption calls when the combined response is missing, doesn't match the
+    request, or any slide is rejected.
+    """
+    from .caption_schemas import PostCaptions, TikTokCaption
+
+    language_text = f" in {language}" if language.lower() != 'english' else ""
+    logger.progress(f"Generating captions and TikTok caption with {model}{language_text}")
+    pool = pool or CaptionPool(model, language)
+
+    try:
+        parsed = await parse_response(client, model, generate_combined_prompt(num_images, language), PostCaptions)
+
+        if parsed is None:
+            raise ValueError("No captions generated")
+        if len(parsed.captions) != num_images:
+            raise ValueError(f"Expected {num_images} captions, got {len(parsed.captions)}")
+        if not parsed.title.strip() or not parsed.hashtags:
+            raise ValueError("TikTok title or hashtags missing")
+
+        if pool.library is not None:
+            pool.library.record(parsed.captions, language, model)
+        # Accepted slides stay in the pool, so a fallback only asks for the rest
+        rejected = num_images - pool.add(parsed.captions)
+        if rejected:
+            raise ValueError(f"{rejected} of {num_images} captions were rejected")
+
+        captions = await pool.take_async(num_images, client)
+        logger.success(f"Generated {len(captions)} captions and TikTok caption")
+        return captions, TikTokCaption(title=parsed.title, hashtags=parsed.hashtags)
+    except Exception as e:
+        logger.warning(f"Combined caption generation failed, falling back to separate calls: {e}")
+
+    captions, tiktok_caption = await asyncio.gather(
+        pool.take_async(num_images, client),
+        generate_tiktok_captions_async(client, 1, model, language),
+    )
+    return captions, tiktok_caption
+
+
+def request_captions(num_images, model=OPENAI_MODEL, language='english') -> Future:
+    """Start generating captions and return a future for the result"""
+    service = get_caption_service()
+    return service.submit(generate_captions_async(service.client, num_images, model, language))
+
+
+def request_tiktok_captions(num_captions=1, model=OPENAI_MODEL, language='english') -> Future:
+    """Start generating a TikTok caption and return a future for the result"""
+    service = get_caption_service()
+    return service.submit(generate_tiktok_captions_async(service.client, num_captions, model, language))
+
+
+def request_post_captions(num_images, model=OPENAI_MODEL, language='english', pool=None) -> Future:
+    """Start generating slide captions and a TikTok caption together and return a future for both"""
+    service = get_caption_service()
+    return service.submit(generate_post_captions_async(service.client, num_images, model, language, pool))
+
+
+def generate_captions(num_images, model=OPENAI_MODEL, language='english'):
+    """Generate captions using OpenAI API"""
+    return request_captions(num_images, model, language).result()
+
+
+def generate_tiktok_captions(num_captions=1, model=OPENAI_MODEL, language='english'):
+    """Generate TikTok captions using OpenAI API"""
+    return request_tiktok_captions(num_captions, model, language).result()
+
+
 def generate_prompt(num_images, language='english'):
     """Generate prompt for caption generation"""
     base_prompt = f"""Generate {num_images} motivational phrases in all lowercase, under 13 words each. These will be accompanied by a happy picture of LeBron James. Match this style exactly:
@@ -145,3 +288,14 @@ Keep the quote 12 words or less and make it resonate with a young audience inter
         return f"""{base_prompt}
 
 IMPORTANT: Generate the inspirational quote in {language}. Make sure the quote is culturally appropriate and resonates with young people who speak {language}. The hashtags should be in English as they're for international reach, but the quote itself should be in {language}."""
+
+
+def generate_combined_prompt(num_images, language='english'):
+    """Generate prompt for slide captions and a TikTok caption in one request"""
+    return f"""{generate_prompt(num_images, language)}
+
+In the same response, also write the caption for the TikTok post itself.
+
+{generate_tiktok_prompt(1, language)}
+
+Return "captions" with exactly {num_images} phrases for the slides, plus "title" and "hashtags" for the TikTok caption."""
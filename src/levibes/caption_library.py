@@ -0,0 +1,213 @@
+"""
+Persistent caption library with a near-duplicate index
+
+Every generated and used caption is stored in SQLite. Captions are indexed
+with MinHash signatures over word n-grams, split into LSH bands, so
+finding recently used captions similar to a new one is a handful of indexed
+lookups regardless of how large the library grows.
+"""
+
+import time
+import sqlite3
+import hashlib
+import operator
+import threading
+from array import array
+from pathlib import Path
+from typing import Iterable, List, Optional, Set, Tuple
+from .caption_pool import normalize_caption
+from .config import (
+    CAPTION_LIBRARY_PATH,
+    CAPTION_REPEAT_WINDOW_DAYS,
+    CAPTION_SIMILARITY_THRESHOLD,
+    MINHASH_BANDS,
+    MINHASH_PERMUTATIONS,
+)
+
+_ROWS_PER_BAND = MINHASH_PERMUTATIONS // MINHASH_BANDS
+# Signatures are compared by estimate first; only close ones get an exact check
+_ESTIMATE_MARGIN = 0.15
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS captions (
+    id INTEGER PRIMARY KEY,
+    text TEXT NOT NULL,
+    normalized TEXT NOT NULL UNIQUE,
+    language TEXT,
+    model TEXT,
+    created_at REAL NOT NULL,
+    used_at REAL,
+    signature BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS captions_used_at ON captions (used_at);
+CREATE TABLE IF NOT EXISTS caption_bands (
+    key INTEGER NOT NULL,
+    caption_id INTEGER NOT NULL,
+    PRIMARY KEY (key, caption_id)
+) WITHOUT ROWID;
+"""
+
+
+def shingles(caption: str) -> Set[str]:
+    """
+    Split a caption into the features compared for near-duplicates.
+
+    Args:
+        caption: Caption text
+
+    Returns:
+        Word unigrams and bigrams of the normalized caption, or character
+        trigrams for captions written without spaces between words
+    """
+    words = normalize_caption(caption).split()
+    if len(words) < 3:
+        text = " ".join(words)
+        return {text[i:i + 3] for i in range(max(1, len(text) - 2))}
+    return set(words) | {f"{a} {b}" for a, b in zip(words, words[1:])}
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    """Jaccard similarity of two shingle sets"""
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def minhash(shingle_set: Set[str]) -> array:
+    """
+    Compute the MinHash signature of a shingle set.
+
+    A single SHAKE-128 digest per shingle supplies one 16-bit hash per
+    permutation, so signing needs one hash call per shingle rather than one
+    per shingle and permutation.
+
+    Args:
+        shingle_set: Shingles of one caption
+
+    Returns:
+        Array of MINHASH_PERMUTATIONS unsigned 16-bit minimum hashes
+    """
+    hashes = [
+        memoryview(hashlib.shake_128(shingle.encode("utf-8")).digest(2 * MINHASH_PERMUTATIONS)).cast("H")
+        for shingle in shingle_set
+    ]
+    return array("H", map(min, *hashes))
+
+
+def band_keys(signature: array) -> List[int]:
+    """Hash each LSH band of a signature, with its band number, to a signed 64-bit key"""
+    keys = []
+    for band in range(MINHASH_BANDS):
+        rows = signature[band * _ROWS_PER_BAND:(band + 1) * _ROWS_PER_BAND]
+        digest = hashlib.blake2b(bytes([band]) + rows.tobytes(), digest_size=8).digest()
+        keys.append(int.from_bytes(digest, "little", signed=True))
+    return keys
+
+
+def estimate_similarity(a: array, b: array) -> float:
+    """Estimate Jaccard similarity from two MinHash signatures"""
+    return sum(map(operator.eq, a, b)) / len(a)
+
+
+class CaptionLibrary:
+    """
+    SQLite store of generated and used captions.
+
+    Safe to share between threads; all access goes through one connection
+    guarded by a lock.
+    """
+
+    def __init__(
+        self,
+        path: Path = CAPTION_LIBRARY_PATH,
+        threshold: float = CAPTION_SIMILARITY_THRESHOLD,
+        window_days: float = CAPTION_REPEAT_WINDOW_DAYS,
+    ):
+        self.path = Path(path)
+        self.threshold = threshold
+        self.window = window_days * 86400
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def record(self, captions: Iterable[str], language: Optional[str] = None, model: Optional[str] = None, used: bool = False) -> None:
+        """
+        Store captions, or mark stored ones as used.
+
+        Args:
+            captions: Captions to store
+            language: Language the captions were generated in
+            model: Model that generated them (None for captions from a file)
+            used: Whether the captions were rendered into a post
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            for caption in captions:
+                signature = minhash(shingles(caption))
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO captions (text, normalized, language, model, created_at, used_at, signature) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (caption, normalize_caption(caption), language, model, now,
+                     now if used else None, signature.tobytes()),
+                )
+                if cursor.rowcount:
+                    self._conn.executemany(
+                        "INSERT OR IGNORE INTO caption_bands (key, caption_id) VALUES (?, ?)",
+                        [(key, cursor.lastrowid) for key in band_keys(signature)],
+                    )
+                elif used:
+                    self._conn.execute(
+                        "UPDATE captions SET used_at = ? WHERE normalized = ?",
+                        (now, normalize_caption(caption)),
+                    )
+
+    def mark_used(self, captions: Iterable[str], language: Optional[str] = None, model: Optional[str] = None) -> None:
+        """Record captions as used in a post"""
+        self.record(captions, language, model, used=True)
+
+    def find_similar(self, caption: str) -> Optional[Tuple[str, float]]:
+        """
+        Find the most similar caption used within the repeat window.
+
+        Args:
+            caption: Caption to check
+
+        Returns:
+            Tuple of (used caption, Jaccard similarity) at or above the
+            similarity threshold, or None if the caption is fresh
+        """
+        caption_shingles = shingles(caption)
+        signature = minhash(caption_shingles)
+        keys = band_keys(signature)
+        since = time.time() - self.window
+
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT c.text, c.signature FROM captions c WHERE c.id IN "
+                f"(SELECT caption_id FROM caption_bands WHERE key IN ({', '.join('?' * len(keys))})) "
+                f"AND c.used_at >= ?",
+                keys + [since],
+            ).fetchall()
+
+        best = None
+        for text, blob in rows:
+            candidate = array("H")
+            candidate.frombytes(blob)
+            if estimate_similarity(signature, candidate) < self.threshold - _ESTIMATE_MARGIN:
+                continue
+            similarity = jaccard(caption_shingles, shingles(text))
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (text, similarity)
+        return best
+
+    def count(self) -> int:
+        """Number of captions in the library"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM captions").fetchone()[0]
+
+    def close(self) -> None:
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
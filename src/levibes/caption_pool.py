@@ -0,0 +1,154 @@
+"""
+Over-generated caption pool with local validation
+"""
+
+import re
+import math
+import asyncio
+from concurrent.futures import Future
+from typing import List, Optional, Set
+from .config import (
+    CAPTION_BANNED_PUNCTUATION,
+    CAPTION_MAX_WORDS,
+    CAPTION_OVERGENERATE_RATIO,
+    CAPTION_POOL_MAX_REQUESTS,
+    OPENAI_MODEL,
+)
+from .utils.logger import logger
+
+
+def normalize_caption(caption: str) -> str:
+    """Reduce a caption to lowercase words for duplicate detection"""
+    return " ".join(re.findall(r"\w+", caption.lower()))
+
+
+def validate_caption(caption: str) -> Optional[str]:
+    """
+    Check a caption against the rules in the caption prompt.
+
+    Args:
+        caption: Caption to check
+
+    Returns:
+        Reason the caption was rejected, or None if it is valid
+    """
+    if not caption.strip():
+        return "empty"
+    if len(caption.split()) > CAPTION_MAX_WORDS:
+        return f"over {CAPTION_MAX_WORDS} words"
+    if caption != caption.lower():
+        return "not lowercase"
+    for punctuation in CAPTION_BANNED_PUNCTUATION:
+        if punctuation in caption:
+            return f"contains {punctuation!r}"
+    return None
+
+
+class CaptionPool:
+    """
+    Captions requested in bulk and handed out as they are needed.
+
+    Each request asks for more captions than are missing, drops the ones
+    that break the prompt's rules or repeat an earlier caption (or, with a
+    caption library, one used recently), and keeps
+    the rest for later calls, so a rejected set or the next post in a batch
+    can often be served without another API call.
+    """
+
+    def __init__(
+        self,
+        model: str = OPENAI_MODEL,
+        language: str = "english",
+        overgenerate_ratio: float = CAPTION_OVERGENERATE_RATIO,
+        max_requests: int = CAPTION_POOL_MAX_REQUESTS,
+        library=None,
+    ):
+        self.model = model
+        self.language = language
+        self.library = library
+        self.overgenerate_ratio = overgenerate_ratio
+        self.max_requests = max_requests
+        self._available: List[str] = []
+        self._seen: Set[str] = set()
+        self._lock: Optional[asyncio.Lock] = None
+
+    def add(self, captions: List[str]) -> int:
+        """
+        Add captions to the pool, skipping invalid and duplicate ones.
+
+        Args:
+            captions: Candidate captions
+
+        Returns:
+            Number of captions added
+        """
+        added = 0
+        for caption in captions:
+            caption = caption.strip()
+            reason = validate_caption(caption)
+            key = normalize_caption(caption)
+            if reason is None and key in self._seen:
+                reason = "duplicate"
+            if reason is None and self.library is not None:
+                similar = self.library.find_similar(caption)
+                if similar is not None:
+                    reason = f"too similar to used caption '{similar[0]}'"
+            if reason is not None:
+                logger.warning(f"Dropped caption ({reason}): {caption}")
+                continue
+            self._seen.add(key)
+            self._available.append(caption)
+            added += 1
+        return added
+
+    async def take_async(self, count: int, client=None) -> List[str]:
+        """
+        Take captions from the pool, requesting more only for the shortfall.
+
+        Args:
+            count: Number of captions needed
+            client: AsyncOpenAI client to request with (the caption service's by default)
+
+        Returns:
+            List of valid, previously unused captions
+        """
+        from .caption_generation import generate_captions_async, get_caption_service
+
+        # Created lazily so the lock belongs to the loop the pool is used on
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            requests = 0
+            while len(self._available) < count:
+                if requests >= self.max_requests:
+                    raise ValueError(
+                        f"Only {len(self._available)} valid captions after {requests} requests, need {count}"
+                    )
+                shortfall = count - len(self._available)
+                request_count = max(shortfall + 1, math.ceil(shortfall * self.overgenerate_ratio))
+                client = client or get_caption_service().client
+                captions = await generate_captions_async(client, request_count, self.model, self.language)
+                if self.library is not None:
+                    self.library.record(captions, self.language, self.model)
+                self.add(captions)
+                requests += 1
+
+            taken, self._available = self._available[:count], self._available[count:]
+            return taken
+
+    def request(self, count: int) -> Future:
+        """Start taking captions on the caption service and return a future for them"""
+        # Imported on first use so the pool's validation helpers stay cheap to import
+        from .caption_generation import get_caption_service
+
+        return get_caption_service().submit(self.take_async(count))
+
+    def take(self, count: int) -> List[str]:
+        """Take captions from the pool, requesting more only for the shortfall"""
+        return self.request(count).result()
+
+    @property
+    def available(self) -> int:
+        """Number of unused captions in the pool"""
+        return len(self._available)
@@ -0,0 +1,22 @@
+"""
+Structured output schemas for caption requests
+
+Kept apart from caption_generation so importing it doesn't load pydantic.
+"""
+
+from pydantic import BaseModel
+
+
+class Captions(BaseModel):
+    captions: list[str]
+
+
+class TikTokCaption(BaseModel):
+    title: str
+    hashtags: list[str]
+
+
+class PostCaptions(BaseModel):
+    captions: list[str]
+    title: str
+    hashtags: list[str]
@@ -4,13 +4,33 @@ Command-line interface for LeVibes
 
 from art import text2art
 import gratient
-from prompt_toolkit import prompt
-from prompt_toolkit.validation import Validator
-from prompt_toolkit.shortcuts import confirm
 from .config import DEFAULT_NUM_IMAGES, DEFAULT_IMAGES_DIR, DEFAULT_OUTPUT_DIR
 from .utils.logger import logger
 
 
+# prompt_toolkit is imported on first use, so runs with every option given
+# on the command line don't pay for loading it
+def prompt(*args, **kwargs):
+    """Read a line of input with prompt_toolkit."""
+    from prompt_toolkit import prompt as toolkit_prompt
+
+    return toolkit_prompt(*args, **kwargs)
+
+
+def confirm(message):
+    """Ask a yes/no question with prompt_toolkit."""
+    from prompt_toolkit.shortcuts import confirm as toolkit_confirm
+
+    return toolkit_confirm(message)
+
+
+def validator_from_callable(*args, **kwargs):
+    """Build a prompt_toolkit input validator from a function."""
+    from prompt_toolkit.validation import Validator
+
+    return Validator.from_callable(*args, **kwargs)
+
+
 def display_welcome():
     """Display welcome message with simple ASCII art."""
     ascii_art = text2art("LeVibes", font="bolger")
@@ -40,7 +60,7 @@ def ask_caption_source(caption_source=None):
 
     choice = prompt(
         "Enter your choice (1 or 2): ",
-        validator=Validator.from_callable(
+        validator=validator_from_callable(
             lambda x: x in ["1", "2"],
             error_message="Please enter 1 or 2",
             move_cursor_to_end=True,
@@ -79,7 +99,7 @@ def get_caption_file_path(num_images, caption_file=None):
         except:
             return False
 
-    file_validator = Validator.from_callable(
+    file_validator = validator_from_callable(
         is_valid_caption_file,
         error_message=f"File doesn't exist or doesn't contain at least {num_images} captions (one per line)",
         move_cursor_to_end=True,
@@ -135,7 +155,7 @@ def get_user_inputs(num_images=None, path_to_images=None, output_dir=None):
                 >= num_images
             )
 
-        path_validator = Validator.from_callable(
+        path_validator = validator_from_callable(
             is_valid_directory,
             error_message="Not a valid image directory (either doesn't exist or doesn't contain enough images).",
             move_cursor_to_end=True,
@@ -2,6 +2,7 @@
 Configuration settings for LeVibes
 """
 
+import os
 import argparse
 from pathlib import Path
 
@@ -11,6 +12,22 @@ DEFAULT_IMAGES_DIR = "./images"
 DEFAULT_OUTPUT_DIR = "./output"
 DEFAULT_IMAGE_SIZE = (1000, 1000)
 
+# Source image decoding settings
+RESAMPLE_FILTERS = ("nearest", "box", "bilinear", "hamming", "bicubic", "lanczos")
+DEFAULT_RESAMPLE = "bicubic"
+JPEG_DRAFT = True  # decode large JPEGs at a reduced DCT scale before resizing
+
+# Output encoding settings
+OUTPUT_FORMAT_CHOICES = ("jpeg", "webp", "png", "source")
+DEFAULT_OUTPUT_FORMAT = "jpeg"  # TikTok photo posts accept JPEG and WebP
+DEFAULT_OUTPUT_QUALITY = 95
+SUBSAMPLING_CHOICES = ("4:4:4", "4:2:2", "4:2:0")
+DEFAULT_OUTPUT_SUBSAMPLING = "4:2:0"
+
+# Rendering executor settings
+EXECUTOR_CHOICES = ("thread", "process")
+DEFAULT_EXECUTOR = "thread"
+
 # Font settings
 FONT_NAMES = [
     "Montserrat-VariableFont_wght.ttf",
@@ -18,12 +35,45 @@ FONT_NAMES = [
     "arial.ttf",
     "DejaVuSans.ttf",
 ]
+FONT_VARIATION = "Regular"  # named instance used for variable fonts
+FONT_CACHE_SIZE = 256  # (font, size, variation) entries kept per process
 
 # Image processing settings
 PADDING_SCALING_FACTOR = 1.0
 LINE_SPACING_RATIO = 0.4
 MAX_TEXT_WIDTH_RATIO = 0.9
 FONT_SIZE_RATIO = 20  # image width divided by this value
+FALLBACK_FONT_SIZE = 10  # used when no size fits the caption
+
+# Cloudflare R2 upload settings
+R2_UPLOAD_CONCURRENCY = 8  # parallel uploads per carousel
+R2_MAX_POOL_CONNECTIONS = 16  # HTTP connections kept open by the shared R2 client
+R2_HEAD_CHECK = False  # HEAD the bucket for manifest misses, and once per run for manifest hits
+
+# TikTok API settings
+TIKTOK_CONNECT_TIMEOUT = 5  # seconds
+TIKTOK_READ_TIMEOUT = 30  # seconds
+TIKTOK_MAX_RETRIES = 4
+TIKTOK_BACKOFF_BASE = 0.5  # seconds, doubled on each retry
+TIKTOK_BACKOFF_MAX = 30  # seconds
+PUBLISH_POLL_INITIAL_INTERVAL = 2  # seconds between status checks while the status changes
+PUBLISH_POLL_MAX_INTERVAL = 30  # seconds, longest wait between checks of a stalled publish
+PUBLISH_POLL_BACKOFF = 1.5  # interval growth while the status is unchanged
+PUBLISH_POLL_TIMEOUT = 600  # seconds before giving up on a publish
+PUBLISH_POLL_CONCURRENCY = 4  # status requests in flight across publishes
+
+# Caption rules (from the caption prompt) and pool settings
+CAPTION_MAX_WORDS = 13
+CAPTION_BANNED_PUNCTUATION = ("\u2014", "\u2013", "...", "\u2026")  # em/en dashes and ellipses
+CAPTION_OVERGENERATE_RATIO = 1.5  # captions requested per missing caption
+CAPTION_POOL_MAX_REQUESTS = 3  # API calls per take before giving up
+
+# Batch mode settings
+BATCH_PREFETCH = 1  # posts captioned or rendered ahead of the stage after them
+
+# Serve mode settings
+JOB_CONCURRENCY = 2  # jobs the serve daemon works on at once
+JOB_POLL_INTERVAL = 1.0  # seconds between queue checks while idle
 
 # OpenAI settings
 OPENAI_MODEL = "gpt-4.1"
@@ -39,6 +89,27 @@ SRC_DIR = PROJECT_ROOT / "src"
 IMAGES_DIR = PROJECT_ROOT / "images"
 OUTPUT_DIR = PROJECT_ROOT / "output"
 
+# Cache settings
+CACHE_DIR = Path(os.environ.get("LEVIBES_CACHE_DIR", PROJECT_ROOT / ".cache"))
+LAYOUT_CACHE_DIR = CACHE_DIR / "layouts"
+LAYOUT_CACHE_SIZE = 1024  # caption layouts kept in memory per process
+SOURCE_CACHE_DIR = CACHE_DIR / "sources"
+SOURCE_CACHE_MAX_BYTES = 4 * 1024 ** 3  # total size of preprocessed source images
+R2_MANIFEST_DIR = CACHE_DIR / "r2"  # content hashes already uploaded, per endpoint and bucket
+TOKEN_STORE_DIR = CACHE_DIR / "tokens"  # encrypted TikTok OAuth tokens
+TOKEN_EXPIRY_MARGIN = 300  # seconds before expiry at which tokens are refreshed
+CAPTION_LIBRARY_PATH = CACHE_DIR / "captions.sqlite3"  # every generated and used caption
+RESPONSE_CACHE_DIR = CACHE_DIR / "openai"  # parsed OpenAI responses
+RESPONSE_CACHE_TTL = 7 * 24 * 3600  # seconds a cached response is reused
+RESPONSE_CACHE_MAX_BYTES = 64 * 1024 ** 2  # total size of cached responses
+JOB_QUEUE_PATH = CACHE_DIR / "jobs.sqlite3"  # jobs for the serve daemon
+
+# Caption library near-duplicate settings
+CAPTION_SIMILARITY_THRESHOLD = 0.6  # word n-gram Jaccard similarity that counts as a repeat
+CAPTION_REPEAT_WINDOW_DAYS = 90  # used captions within this window block similar ones
+MINHASH_PERMUTATIONS = 64
+MINHASH_BANDS = 16  # LSH bands of MINHASH_PERMUTATIONS / MINHASH_BANDS rows each
+
 def load_cli_args():
     """Load CLI arguments."""
     parser = argparse.ArgumentParser(
@@ -49,6 +120,11 @@ Examples:
   python main.py --caption-source ai --num-images 10 --images-dir ./images --output-dir ./output
   python main.py -s file -n 5 -i ./images -o ./output -c ./captions.txt
   python main.py -s ai -n 3 --upload-tiktok  # Generate and upload to TikTok
+  python main.py -s ai -n 5 --posts 10 --upload-tiktok  # Generate and upload 10 posts
+  python main.py -s file -n 5 -c ./captions.txt --timing-report run.json  # Report where time went
+  python main.py warm-cache -i ./images  # Prebuild the source image cache
+  python main.py serve --upload-concurrency 8  # Run as a daemon processing queued jobs
+  python main.py submit -s ai -n 5 --upload  # Queue a job for the daemon
         """
     )
     
@@ -103,16 +179,471 @@ Examples:
         help='Language for caption generation (default: english)'
     )
     
+    parser.add_argument(
+        '--combined-captions',
+        action='store_true',
+        help='Generate slide captions and the TikTok caption in a single OpenAI call'
+    )
+    
+    parser.add_argument(
+        '--caption-library',
+        action='store_true',
+        help=f'Record captions in {CAPTION_LIBRARY_PATH} and reject ones too similar to recently used captions'
+    )
+    
+    parser.add_argument(
+        '--response-cache',
+        action='store_true',
+        help=f'Reuse OpenAI responses for identical requests (stored in {RESPONSE_CACHE_DIR})'
+    )
+    
+    parser.add_argument(
+        '--response-cache-ttl',
+        type=int,
+        default=RESPONSE_CACHE_TTL,
+        help=f'Seconds a cached OpenAI response stays valid (default: {RESPONSE_CACHE_TTL})'
+    )
+    
+    parser.add_argument(
+        '--replay',
+        action='store_true',
+        help='Serve OpenAI responses only from the response cache and never call the API'
+    )
+    
+    parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        help='Number of render workers (default: number of CPUs)'
+    )
+    
+    parser.add_argument(
+        '--executor',
+        choices=EXECUTOR_CHOICES,
+        default=DEFAULT_EXECUTOR,
+        help=f'Render backend: "thread" pool or "process" pool for multi-core rendering (default: {DEFAULT_EXECUTOR})'
+    )
+    
+    parser.add_argument(
+        '-f', '--output-format',
+        choices=OUTPUT_FORMAT_CHOICES,
+        default=DEFAULT_OUTPUT_FORMAT,
+        help=f'Format for captioned images; "source" keeps the source format (default: {DEFAULT_OUTPUT_FORMAT})'
+    )
+    
+    parser.add_argument(
+        '-q', '--quality',
+        type=int,
+        default=DEFAULT_OUTPUT_QUALITY,
+        help=f'JPEG/WebP quality from 1 to 100 (default: {DEFAULT_OUTPUT_QUALITY})'
+    )
+    
+    parser.add_argument(
+        '--subsampling',
+        choices=SUBSAMPLING_CHOICES,
+        default=DEFAULT_OUTPUT_SUBSAMPLING,
+        help=f'JPEG chroma subsampling (default: {DEFAULT_OUTPUT_SUBSAMPLING})'
+    )
+    
+    parser.add_argument(
+        '--optimize',
+        action='store_true',
+        help='Spend extra encode time for smaller output files'
+    )
+    
+    parser.add_argument(
+        '--progressive',
+        action='store_true',
+        help='Write progressive JPEGs'
+    )
+    
+    parser.add_argument(
+        '--layout-cache',
+        action='store_true',
+        help=f'Persist caption layouts on disk so repeated captions skip text measurement (stored in {LAYOUT_CACHE_DIR})'
+    )
+    
+    parser.add_argument(
+        '--resample',
+        choices=RESAMPLE_FILTERS,
+        default=DEFAULT_RESAMPLE,
+        help=f'Resampling filter used to resize source images (default: {DEFAULT_RESAMPLE})'
+    )
+    
+    parser.add_argument(
+        '--no-jpeg-draft',
+        dest='jpeg_draft',
+        action='store_false',
+        help='Fully decode JPEG sources instead of decoding at a reduced scale'
+    )
+    
+    parser.add_argument(
+        '--source-cache',
+        action='store_true',
+        help=f'Reuse decoded and resized source images from {SOURCE_CACHE_DIR} (see "levibes warm-cache")'
+    )
+    
+    parser.add_argument(
+        '--source-cache-max-bytes',
+        type=int,
+        default=SOURCE_CACHE_MAX_BYTES,
+        help=f'Evict least recently used source images beyond this many bytes (default: {SOURCE_CACHE_MAX_BYTES})'
+    )
+    
     parser.add_argument(
         '--upload-tiktok',
         action='store_true',
         help='Upload images to TikTok as drafts after generation'
     )
     
+    parser.add_argument(
+        '--upload-concurrency',
+        type=int,
+        default=R2_UPLOAD_CONCURRENCY,
+        help=f'Number of images uploaded to cloud storage in parallel (default: {R2_UPLOAD_CONCURRENCY})'
+    )
+    
+    parser.add_argument(
+        '--verify-uploads',
+        action='store_true',
+        default=R2_HEAD_CHECK,
+        help='Check with the bucket that previously uploaded images are still there before linking to them'
+    )
+    
+    parser.add_argument(
+        '--stream-upload',
+        action='store_true',
+        help='Upload each image to cloud storage from memory as soon as it is rendered (requires --upload-tiktok)'
+    )
+    
+    parser.add_argument(
+        '--no-save',
+        action='store_true',
+        help='Do not save rendered images to disk (requires --stream-upload)'
+    )
+    
+    parser.add_argument(
+        '--posts',
+        type=int,
+        default=1,
+        help='Number of posts to generate in one run; more than one runs non-interactively (default: 1)'
+    )
+    
+    parser.add_argument(
+        '--manifest',
+        help='JSON file describing the posts to generate in one run (see README)'
+    )
+    
+    parser.add_argument(
+        '--wait-status',
+        action='store_true',
+        help='After uploading to TikTok, wait until the draft has been processed and report its status'
+    )
+    
+    parser.add_argument(
+        '--timing-report',
+        metavar='PATH',
+        help='Write a JSON report of where the run spent its time (per stage, per image phase and per post)'
+    )
+    
+    parser.add_argument(
+        '--profile',
+        metavar='DIR',
+        help='Profile the captions, render, upload and auth stages with cProfile, writing one .prof file per stage and report.json to DIR'
+    )
+    
+    parser.add_argument(
+        '--metrics-textfile',
+        metavar='PATH',
+        help='At the end of the run, add its Prometheus metrics to PATH for node_exporter\'s textfile collector'
+    )
+    
+    parser.add_argument(
+        '--metrics-port',
+        type=int,
+        metavar='PORT',
+        help='Serve Prometheus metrics on http://127.0.0.1:PORT/metrics while running'
+    )
+    
+    parser.add_argument(
+        '--outro-image',
+        default='outro.png',
+        help='Path to outro image for TikTok uploads (default: outro.png)'
+    )
+    
+    return parser.parse_args()
+
+
+def load_warm_cache_args(argv=None):
+    """Load CLI arguments for the warm-cache command."""
+    parser = argparse.ArgumentParser(
+        prog="levibes warm-cache",
+        description="Prebuild the decoded and resized source image cache",
+    )
+    
+    parser.add_argument(
+        '-i', '--images-dir',
+        default=DEFAULT_IMAGES_DIR,
+        help=f'Directory containing source images (default: {DEFAULT_IMAGES_DIR})'
+    )
+    
+    parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        help='Number of decode workers (default: number of CPUs)'
+    )
+    
+    parser.add_argument(
+        '--executor',
+        choices=EXECUTOR_CHOICES,
+        default="process",
+        help='Decode backend: "thread" pool or "process" pool (default: process)'
+    )
+    
+    parser.add_argument(
+        '--source-cache-max-bytes',
+        type=int,
+        default=SOURCE_CACHE_MAX_BYTES,
+        help=f'Evict least recently used source images beyond this many bytes (default: {SOURCE_CACHE_MAX_BYTES})'
+    )
+    
+    parser.add_argument(
+        '--resample',
+        choices=RESAMPLE_FILTERS,
+        default=DEFAULT_RESAMPLE,
+        help=f'Resampling filter used to resize source images (default: {DEFAULT_RESAMPLE})'
+    )
+    
+    parser.add_argument(
+        '--no-jpeg-draft',
+        dest='jpeg_draft',
+        action='store_false',
+        help='Fully decode JPEG sources instead of decoding at a reduced scale'
+    )
+    
+    return parser.parse_args(argv)
+
+
+def load_serve_args(argv=None):
+    """Load CLI arguments for the serve command."""
+    parser = argparse.ArgumentParser(
+        prog="levibes serve",
+        description="Process queued jobs with warm clients and caches until stopped",
+    )
+    
+    parser.add_argument(
+        '--queue',
+        default=str(JOB_QUEUE_PATH),
+        help=f'SQLite job queue to process (default: {JOB_QUEUE_PATH})'
+    )
+    
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        default=JOB_CONCURRENCY,
+        help=f'Number of jobs processed at once (default: {JOB_CONCURRENCY})'
+    )
+    
+    parser.add_argument(
+        '--poll-interval',
+        type=float,
+        default=JOB_POLL_INTERVAL,
+        help=f'Seconds between queue checks while idle (default: {JOB_POLL_INTERVAL})'
+    )
+    
+    parser.add_argument(
+        '-i', '--images-dir',
+        default=DEFAULT_IMAGES_DIR,
+        help=f'Source images for jobs that don\'t set images_dir (default: {DEFAULT_IMAGES_DIR})'
+    )
+    
+    parser.add_argument(
+        '-o', '--output-dir',
+        default=DEFAULT_OUTPUT_DIR,
+        help=f'Directory to save captioned images (default: {DEFAULT_OUTPUT_DIR})'
+    )
+    
+    parser.add_argument(
+        '-m', '--model',
+        default=OPENAI_MODEL,
+        help=f'OpenAI model for jobs that don\'t set one (default: {OPENAI_MODEL})'
+    )
+    
+    parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        help='Number of render workers shared by all jobs (default: number of CPUs)'
+    )
+    
+    parser.add_argument(
+        '--executor',
+        choices=EXECUTOR_CHOICES,
+        default=DEFAULT_EXECUTOR,
+        help=f'Render backend: "thread" pool or "process" pool for multi-core rendering (default: {DEFAULT_EXECUTOR})'
+    )
+    
+    parser.add_argument(
+        '--layout-cache',
+        action='store_true',
+        help=f'Persist caption layouts on disk (stored in {LAYOUT_CACHE_DIR})'
+    )
+    
+    parser.add_argument(
+        '--source-cache',
+        action='store_true',
+        help=f'Reuse decoded and resized source images from {SOURCE_CACHE_DIR}'
+    )
+    
+    parser.add_argument(
+        '--combined-captions',
+        action='store_true',
+        help='Generate slide captions and the TikTok caption in a single OpenAI call'
+    )
+    
+    parser.add_argument(
+        '--caption-library',
+        action='store_true',
+        help=f'Record captions in {CAPTION_LIBRARY_PATH} and reject ones too similar to recently used captions'
+    )
+    
+    parser.add_argument(
+        '--no-tiktok',
+        action='store_true',
+        help='Use the first slide caption as the TikTok caption instead of generating one'
+    )
+    
+    parser.add_argument(
+        '--upload-concurrency',
+        type=int,
+        default=R2_UPLOAD_CONCURRENCY,
+        help=f'Number of images uploaded to cloud storage in parallel (default: {R2_UPLOAD_CONCURRENCY})'
+    )
+    
+    parser.add_argument(
+        '--verify-uploads',
+        action='store_true',
+        default=R2_HEAD_CHECK,
+        help='Check with the bucket that previously uploaded images are still there before linking to them'
+    )
+    
+    parser.add_argument(
+        '--stream-upload',
+        action='store_true',
+        help='Upload each image to cloud storage from memory as soon as it is rendered'
+    )
+    
     parser.add_argument(
         '--outro-image',
         default='outro.png',
         help='Path to outro image for TikTok uploads (default: outro.png)'
     )
     
-    return parser.parse_args()
\ No newline at end of file
+    parser.add_argument(
+        '--metrics-port',
+        type=int,
+        metavar='PORT',
+        help='Serve Prometheus metrics on http://127.0.0.1:PORT/metrics'
+    )
+    
+    parser.add_argument(
+        '--metrics-textfile',
+        metavar='PATH',
+        help='Add metrics to a node_exporter textfile after every job'
+    )
+    
+    parser.add_argument(
+        '-f', '--output-format',
+        choices=OUTPUT_FORMAT_CHOICES,
+        default=DEFAULT_OUTPUT_FORMAT,
+        help=f'Format for captioned images; "source" keeps the source format (default: {DEFAULT_OUTPUT_FORMAT})'
+    )
+    
+    parser.add_argument(
+        '-q', '--quality',
+        type=int,
+        default=DEFAULT_OUTPUT_QUALITY,
+        help=f'JPEG/WebP quality from 1 to 100 (default: {DEFAULT_OUTPUT_QUALITY})'
+    )
+    
+    parser.add_argument(
+        '--response-cache',
+        action='store_true',
+        help=f'Reuse OpenAI responses for identical requests (stored in {RESPONSE_CACHE_DIR})'
+    )
+    
+    parser.add_argument(
+        '--response-cache-ttl',
+        type=int,
+        default=RESPONSE_CACHE_TTL,
+        help=f'Seconds a cached OpenAI response stays valid (default: {RESPONSE_CACHE_TTL})'
+    )
+    
+    # Batch options serve doesn't expose
+    parser.set_defaults(no_save=False)
+    
+    return parser.parse_args(argv)
+
+
+def load_submit_args(argv=None):
+    """Load CLI arguments for the submit command."""
+    parser = argparse.ArgumentParser(
+        prog="levibes submit",
+        description="Queue a post for the serve daemon, or list queued jobs",
+    )
+    
+    parser.add_argument(
+        '--queue',
+        default=str(JOB_QUEUE_PATH),
+        help=f'SQLite job queue to add to (default: {JOB_QUEUE_PATH})'
+    )
+    
+    parser.add_argument(
+        '-s', '--caption-source',
+        choices=['ai', 'file'],
+        help='Source for captions: "ai" for AI-generated, "file" for text file (default: ai)'
+    )
+    
+    parser.add_argument(
+        '-n', '--num-images',
+        type=int,
+        help=f'Number of images to generate (default: {DEFAULT_NUM_IMAGES})'
+    )
+    
+    parser.add_argument(
+        '-l', '--language',
+        help='Language for caption generation (default: english)'
+    )
+    
+    parser.add_argument(
+        '-m', '--model',
+        help='OpenAI model to use for caption generation (default: the daemon\'s)'
+    )
+    
+    parser.add_argument(
+        '-i', '--images-dir',
+        help='Directory containing images to caption (default: the daemon\'s)'
+    )
+    
+    parser.add_argument(
+        '-c', '--caption-file',
+        help='Path to text file containing captions (required when using --caption-source file)'
+    )
+    
+    parser.add_argument(
+        '--upload',
+        action='store_true',
+        help='Upload the post to TikTok as a draft'
+    )
+    
+    parser.add_argument(
+        '--wait',
+        action='store_true',
+        help='Wait for the job to finish and show its result'
+    )
+    
+    parser.add_argument(
+        '--list',
+        action='store_true',
+        help='List the most recent jobs and their status instead of submitting one'
+    )
+    
+    return parser.parse_args(argv)
@@ -0,0 +1,161 @@
+"""
+Output image encoding
+"""
+
+import os
+from dataclasses import dataclass
+from typing import Any, BinaryIO, Dict, Optional
+from PIL import Image
+from .config import (
+    DEFAULT_OUTPUT_FORMAT,
+    DEFAULT_OUTPUT_QUALITY,
+    DEFAULT_OUTPUT_SUBSAMPLING,
+)
+
+# Output format name -> (Pillow format, file extension, content type)
+OUTPUT_FORMATS = {
+    "jpeg": ("JPEG", ".jpg", "image/jpeg"),
+    "webp": ("WEBP", ".webp", "image/webp"),
+    "png": ("PNG", ".png", "image/png"),
+}
+
+EXTENSION_FORMATS = {
+    ".jpg": "jpeg",
+    ".jpeg": "jpeg",
+    ".webp": "webp",
+    ".png": "png",
+}
+
+
+def format_for_path(path: str) -> str:
+    """
+    Get the output format name matching a file's extension.
+
+    Args:
+        path: Path to an image file
+
+    Returns:
+        Output format name ("jpeg", "webp" or "png")
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in EXTENSION_FORMATS:
+        raise ValueError(f"Unsupported image extension: {extension}")
+    return EXTENSION_FORMATS[extension]
+
+
+def content_type_for_path(path: str) -> str:
+    """
+    Get the MIME content type for an image file.
+
+    Args:
+        path: Path to an image file
+
+    Returns:
+        Content type such as "image/jpeg"
+    """
+    return OUTPUT_FORMATS[format_for_path(path)][2]
+
+
+@dataclass(frozen=True)
+class EncoderOptions:
+    """How rendered images are encoded."""
+
+    format: str = DEFAULT_OUTPUT_FORMAT  # "jpeg", "webp", "png" or "source"
+    quality: int = DEFAULT_OUTPUT_QUALITY
+    subsampling: str = DEFAULT_OUTPUT_SUBSAMPLING
+    optimize: bool = False
+    progressive: bool = False
+
+    @classmethod
+    def from_args(cls, args) -> "EncoderOptions":
+        """Build encoder options from parsed CLI arguments."""
+        return cls(
+            format=getattr(args, "output_format", DEFAULT_OUTPUT_FORMAT),
+            quality=getattr(args, "quality", DEFAULT_OUTPUT_QUALITY),
+            subsampling=getattr(args, "subsampling", DEFAULT_OUTPUT_SUBSAMPLING),
+            optimize=getattr(args, "optimize", False),
+            progressive=getattr(args, "progressive", False),
+        )
+
+    def resolve_format(self, source_path: Optional[str] = None) -> str:
+        """
+        Get the concrete output format.
+
+        Args:
+            source_path: Source image path, used when the format is "source"
+
+        Returns:
+            Output format name ("jpeg", "webp" or "png")
+        """
+        if self.format == "source":
+            if not source_path:
+                raise ValueError("A source path is required for the 'source' output format")
+            return format_for_path(source_path)
+        return self.format
+
+    def extension(self, source_path: Optional[str] = None) -> str:
+        """Get the file extension for encoded images."""
+        return OUTPUT_FORMATS[self.resolve_format(source_path)][1]
+
+    def content_type(self, source_path: Optional[str] = None) -> str:
+        """Get the MIME content type for encoded images."""
+        return OUTPUT_FORMATS[self.resolve_format(source_path)][2]
+
+    def save_params(self, output_format: str) -> Dict[str, Any]:
+        """Get the Pillow save parameters for an output format."""
+        if output_format == "jpeg":
+            return {
+                "quality": self.quality,
+                "subsampling": self.subsampling,
+                "optimize": self.optimize,
+                "progressive": self.progressive,
+            }
+        if output_format == "webp":
+            # method trades encode time for smaller files (0 fastest, 6 smallest)
+            return {"quality": self.quality, "method": 6 if self.optimize else 4}
+        return {"optimize": self.optimize}
+
+
+def flatten_to_rgb(img: Image.Image) -> Image.Image:
+    """
+    Convert an image to RGB, compositing any transparency onto white.
+
+    Args:
+        img: Image in any mode
+
+    Returns:
+        RGB image
+    """
+    if img.mode == "RGB":
+        return img
+
+    if img.mode == "P":
+        img = img.convert("RGBA")
+
+    if img.mode in ("RGBA", "LA"):
+        background = Image.new("RGB", img.size, (255, 255, 255))
+        background.paste(img, mask=img.split()[-1])
+        return background
+
+    return img.convert("RGB")
+
+
+def encode_image(img: Image.Image, fp: BinaryIO, options: EncoderOptions, source_path: Optional[str] = None) -> str:
+    """
+    Encode an image to a file object.
+
+    Args:
+        img: Image to encode
+        fp: Binary file object to write to
+        options: Encoder options
+        source_path: Source image path, used when the format is "source"
+
+    Returns:
+        Output format name that was written
+    """
+    output_format = options.resolve_format(source_path)
+    if output_format == "jpeg":
+        img = flatten_to_rgb(img)
+
+    img.save(fp, OUTPUT_FORMATS[output_format][0], **options.save_params(output_format))
+    return output_format
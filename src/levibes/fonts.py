@@ -0,0 +1,105 @@
+"""
+Font loading with process-wide caching
+"""
+
+import os
+import hashlib
+from functools import lru_cache
+from typing import Dict, Optional
+from PIL import ImageFont
+from .config import FONT_NAMES, FONT_CACHE_SIZE, FONT_VARIATION
+
+
+@lru_cache(maxsize=1)
+def resolve_font_path() -> Optional[str]:
+    """
+    Find the first loadable font from FONT_NAMES.
+
+    Missing fonts are only probed once per process; the resolved path is
+    cached so later loads skip the font directory search.
+
+    Returns:
+        Path of the first font Pillow can load, or None if none are available
+    """
+    for name in FONT_NAMES:
+        try:
+            return ImageFont.truetype(name, 10).path
+        except IOError:
+            continue
+    return None
+
+
+@lru_cache(maxsize=FONT_CACHE_SIZE)
+def load_font(name: Optional[str], size: int, variation: Optional[str] = FONT_VARIATION):
+    """
+    Load a font, caching the parsed object by (name, size, variation).
+
+    Args:
+        name: Font file name or path (None for Pillow's default font)
+        size: Font size in points
+        variation: Named variation to apply to variable fonts
+
+    Returns:
+        Loaded font object
+    """
+    if name is None:
+        return ImageFont.load_default()
+
+    font = ImageFont.truetype(name, size)
+    if variation and "VariableFont" in name:
+        font.set_variation_by_name(variation)
+    return font
+
+
+def get_font(size: int, variation: Optional[str] = FONT_VARIATION):
+    """
+    Get the configured caption font at the given size.
+
+    Args:
+        size: Font size in points
+        variation: Named variation to apply to variable fonts
+
+    Returns:
+        Cached font object
+    """
+    return load_font(resolve_font_path(), size, variation)
+
+
+@lru_cache(maxsize=1)
+def font_fingerprint() -> str:
+    """
+    Hash the content of the resolved font file.
+
+    Returns:
+        SHA-256 hex digest of the font file, or of its name if it isn't a file
+    """
+    path = resolve_font_path()
+    digest = hashlib.sha256()
+    if path and os.path.isfile(path):
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 16), b""):
+                digest.update(chunk)
+    else:
+        digest.update(str(path).encode())
+    return digest.hexdigest()
+
+
+def font_cache_info() -> Dict[str, Dict[str, int]]:
+    """
+    Get hit/miss counters for the font caches in this process.
+
+    Returns:
+        Dictionary of counters for the font object and font path caches
+    """
+    stats = {}
+    for label, cached in (("fonts", load_font), ("paths", resolve_font_path)):
+        info = cached.cache_info()
+        stats[label] = {"hits": info.hits, "misses": info.misses, "size": info.currsize}
+    return stats
+
+
+def clear_font_cache() -> None:
+    """Clear the font object and font path caches."""
+    load_font.cache_clear()
+    resolve_font_path.cache_clear()
+    font_fingerprint.cache_clear()
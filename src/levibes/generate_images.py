@@ -3,180 +3,418 @@ Image generation with captions
 """
 
 import os
+import io
+import time
 import random
+import atexit
+import signal
 import asyncio
-from PIL import Image, ImageDraw, ImageFont
+import threading
+import multiprocessing
+from collections import defaultdict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Tuple
+from PIL import Image, ImageDraw
+from . import metrics
 from .config import (
+    DEFAULT_EXECUTOR,
     DEFAULT_IMAGE_SIZE,
-    FONT_NAMES,
-    PADDING_SCALING_FACTOR,
-    LINE_SPACING_RATIO,
-    MAX_TEXT_WIDTH_RATIO,
-    FONT_SIZE_RATIO,
-    SUPPORTED_IMAGE_FORMATS,
+    DEFAULT_RESAMPLE,
+    JPEG_DRAFT,
+    LAYOUT_CACHE_DIR,
+    SOURCE_CACHE_DIR,
+    SOURCE_CACHE_MAX_BYTES,
 )
+from .encoding import EncoderOptions, encode_image
+from .fonts import font_cache_info
+from .sources import (
+    SourceImageCache,
+    cache_source_image,
+    configure_source_cache,
+    list_source_images,
+    load_source_image,
+)
+from .text_layout import configure_layout_cache, get_caption_layout, layout_cache_info
 from .utils.logger import logger
+from .utils.timing import record
+
+
+@dataclass
+class RenderResult:
+    """Outcome of rendering a single captioned image."""
+
+    output_path: Optional[str]
+    worker: str
+    elapsed: float
+    filename: str = ""
+    content_type: str = ""
+    data: Optional[bytes] = None
+    # Seconds spent in each render phase (decode, fit, draw, encode)
+    phases: Dict[str, float] = field(default_factory=dict)
+    # Cache counters of the process that rendered it, after rendering
+    caches: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class RenderSettings:
+    """Per-process render settings applied once to every worker."""
+
+    layout_cache_dir: Optional[str] = None
+    source_cache_dir: Optional[str] = None
+    source_cache_max_bytes: int = SOURCE_CACHE_MAX_BYTES
+    resample: str = DEFAULT_RESAMPLE
+    jpeg_draft: bool = JPEG_DRAFT
+    encoder: EncoderOptions = EncoderOptions()
+
+    @classmethod
+    def from_args(cls, args) -> "RenderSettings":
+        """Build render settings from parsed CLI arguments."""
+        return cls(
+            layout_cache_dir=str(LAYOUT_CACHE_DIR) if getattr(args, "layout_cache", False) else None,
+            source_cache_dir=str(SOURCE_CACHE_DIR) if getattr(args, "source_cache", False) else None,
+            source_cache_max_bytes=getattr(args, "source_cache_max_bytes", None) or SOURCE_CACHE_MAX_BYTES,
+            resample=getattr(args, "resample", DEFAULT_RESAMPLE),
+            jpeg_draft=getattr(args, "jpeg_draft", JPEG_DRAFT),
+            encoder=EncoderOptions.from_args(args),
+        )
+
+
+_encoder_options = EncoderOptions()
+
+
+def configure_renderer(settings: RenderSettings) -> None:
+    """
+    Apply render settings to the current process.
+
+    Used as the process-pool initializer, and called directly for threads.
+
+    Args:
+        settings: Render settings to apply
+    """
+    global _encoder_options
+    _encoder_options = settings.encoder
+    configure_layout_cache(settings.layout_cache_dir)
+    configure_source_cache(
+        settings.source_cache_dir,
+        settings.source_cache_max_bytes,
+        settings.resample,
+        settings.jpeg_draft,
+    )
+
+
+def _init_render_worker(settings: RenderSettings) -> None:
+    """Process-pool initializer: leave Ctrl+C to the parent, then apply settings."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    configure_renderer(settings)
+
+
+def _render_process_context():
+    """
+    Start method for render worker processes.
+
+    Workers are started lazily, by which point the OpenAI, upload and outro
+    threads may be running; a forked child can inherit a lock one of them
+    holds (such as an import lock) and hang. Forkserver and spawn start
+    workers from a clean process instead.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+# Warm executors keyed by (kind, workers, settings) so repeated batches reuse workers
+_executors: Dict[Tuple[str, Optional[int], RenderSettings], Executor] = {}
+_executors_lock = threading.Lock()
+
+
+def get_render_executor(kind: str = DEFAULT_EXECUTOR, workers: Optional[int] = None, settings: Optional[RenderSettings] = None) -> Executor:
+    """
+    Get a warm executor for rendering, creating it on first use.
+
+    Args:
+        kind: "thread" for a thread pool or "process" for a process pool
+        workers: Maximum number of workers (defaults to the CPU count)
+        settings: Render settings applied to each worker process
+
+    Returns:
+        Executor shared by every batch with the same kind, worker count and settings
+    """
+    if kind not in ("thread", "process"):
+        raise ValueError(f"Unknown executor kind: {kind}")
+
+    settings = settings or RenderSettings()
+    if kind == "thread":
+        # Threads share this process, so settings apply here directly
+        configure_renderer(settings)
+
+    key = (kind, workers, settings)
+    with _executors_lock:
+        executor = _executors.get(key)
+        if executor is None:
+            if kind == "process":
+                executor = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=_render_process_context(),
+                    initializer=_init_render_worker,
+                    initargs=(settings,),
+                )
+            else:
+                executor = ThreadPoolExecutor(
+                    max_workers=workers, thread_name_prefix="levibes-render"
+                )
+            _executors[key] = executor
+        return executor
+
+
+def shutdown_render_executors() -> None:
+    """Shut down all warm render executors."""
+    with _executors_lock:
+        for executor in _executors.values():
+            executor.shutdown(wait=True, cancel_futures=True)
+        _executors.clear()
+
+
+atexit.register(shutdown_render_executors)
+
+
+def local_cache_info() -> Dict[str, Any]:
+    """Get the counters of the render caches in this process."""
+    return {"fonts": font_cache_info(), "layouts": layout_cache_info()}
+
+
+# Latest cache counters sent back by each render worker process, keyed by pid
+_worker_caches: Dict[str, Dict[str, Any]] = {}
 
 
-async def process_single_image(image_path, caption_text, output_dir):
+def _sum_counters(total: Dict[str, Any], counters: Dict[str, Any]) -> Dict[str, Any]:
+    for key, value in counters.items():
+        total[key] = _sum_counters(total.get(key, {}), value) if isinstance(value, dict) else total.get(key, 0) + value
+    return total
+
+
+def render_cache_info() -> Dict[str, Any]:
+    """
+    Get the render cache counters summed over this process and every worker process.
+
+    Returns:
+        Dictionary of counters per cache
+    """
+    total = _sum_counters({}, local_cache_info())
+    for counters in list(_worker_caches.values()):
+        _sum_counters(total, counters)
+    return total
+
+
+def render_image(image_path, caption_text, output_dir, return_bytes=False):
+    """Add a caption to an image and save it to the output directory.
+
+    This runs inside an executor worker, so it only takes plain paths and
+    strings to keep the payload shipped to process workers small.
+
+    Args:
+        image_path (str): Path to the input image
+        caption_text (str): Caption text to add to the image
+        output_dir (str): Directory to save the output image (None to skip saving)
+        return_bytes (bool): Return the encoded image in the result
+
+    Returns:
+        RenderResult: Output path, worker label, render time and encoded bytes if requested
+    """
+    # Phase times are returned rather than recorded here, since process
+    # workers don't share the parent's timings
+    start_time = time.perf_counter()
+    phases = {}
+
+    img = load_source_image(image_path, DEFAULT_IMAGE_SIZE)
+    phases["decode"] = time.perf_counter() - start_time
+
+    phase_start = time.perf_counter()
+    layout = get_caption_layout(caption_text, img.width)
+    if not layout.fits:
+        logger.warning(f"Could not fit caption on image {os.path.basename(image_path)}. Caption may be too long.")
+    phases["fit"] = time.perf_counter() - phase_start
+    phase_start = time.perf_counter()
+
+    bar_height = layout.bar_height
+
+    new_img = Image.new(
+        "RGB", (img.width, img.height + int(bar_height)), "white"
+    )
+    new_img.paste(img, (0, int(bar_height)))
+
+    draw = ImageDraw.Draw(new_img)
+
+    text_x = int(img.width * 0.05)
+    current_y = int(((bar_height - layout.text_block_height) / 2))
+
+    for line in layout.lines:
+        draw.text((text_x, current_y), line, font=layout.font, fill="black")
+        current_y += layout.line_height + layout.line_spacing
+    phases["draw"] = time.perf_counter() - phase_start
+    phase_start = time.perf_counter()
+
+    stem = os.path.splitext(os.path.basename(image_path))[0]
+    filename = f"captioned_{stem}{_encoder_options.extension(image_path)}"
+    output_path = os.path.join(output_dir, filename) if output_dir else None
+
+    if return_bytes:
+        buffer = io.BytesIO()
+        encode_image(new_img, buffer, _encoder_options, image_path)
+        data = buffer.getvalue()
+        if output_path:
+            with open(output_path, "wb") as f:
+                f.write(data)
+    else:
+        data = None
+        with open(output_path, "wb") as f:  # type: ignore
+            encode_image(new_img, f, _encoder_options, image_path)
+    phases["encode"] = time.perf_counter() - phase_start
+
+    worker = f"{os.getpid()}/{threading.current_thread().name}"
+    return RenderResult(
+        output_path,
+        worker,
+        time.perf_counter() - start_time,
+        filename,
+        _encoder_options.content_type(image_path),
+        data,
+        phases,
+        local_cache_info(),
+    )
+
+
+async def process_single_image(image_path, caption_text, output_dir, executor=None, return_bytes=False):
     """Process a single image by adding a caption and saving it to the output directory.
 
     Args:
         image_path (str): Path to the input image
         caption_text (str): Caption text to add to the image
-        output_dir (str): Directory to save the output image
+        output_dir (str): Directory to save the output image (None to skip saving)
+        executor (Executor, optional): Executor to render in (defaults to the loop's thread pool)
+        return_bytes (bool): Return the encoded image in the result
 
     Returns:
-        str: Path to the saved output image
-    """
-
-    # Run the image processing in a separate thread to avoid blocking
-    def _process_image():
-        with Image.open(image_path) as img:
-            padding_scaling_factor = PADDING_SCALING_FACTOR
-            line_spacing_ratio = LINE_SPACING_RATIO
-
-            width, height = img.size
-            if width != height:
-                size = min(width, height)
-                left = (width - size) / 2
-                top = (height - size) / 2
-                right = (width + size) / 2
-                bottom = (height + size) / 2
-                img = img.crop((left, top, right, bottom))
-
-            img = img.resize(DEFAULT_IMAGE_SIZE)
-
-            font_size = int(img.width / FONT_SIZE_RATIO)
-            font = None
-            wrapped_text = None
-
-            font_names = FONT_NAMES
-
-            while font_size > 0:
-                for name in font_names:
-                    try:
-                        font = ImageFont.truetype(name, font_size)
-                        if "VariableFont" in name:
-                            font.set_variation_by_name("Regular")
-                        break
-                    except IOError:
-                        continue
-                if not font:
-                    font = ImageFont.load_default()
-
-                draw = ImageDraw.Draw(img)
-                max_text_width = int(img.width * MAX_TEXT_WIDTH_RATIO)
-
-                lines = []
-                words = caption_text.split(" ")
-                current_line = ""
-                word_too_long = False
-                for word in words:
-                    word_bbox = draw.textbbox((0, 0), word, font=font)
-                    if (word_bbox[2] - word_bbox[0]) > max_text_width:
-                        word_too_long = True
-                        break
-
-                    test_line = f"{current_line} {word}" if current_line else word
-                    line_bbox = draw.textbbox((0, 0), test_line, font=font)
-                    if line_bbox[2] - line_bbox[0] <= max_text_width:
-                        current_line = test_line
-                    else:
-                        lines.append(current_line)
-                        current_line = word
-
-                if word_too_long:
-                    font_size -= 2
-                    continue
-
-                if current_line:
-                    lines.append(current_line)
-
-                wrapped_text = lines
-                break
-
-            if not wrapped_text:
-                logger.warning(f"Could not fit caption on image {os.path.basename(image_path)}. Caption may be too long.")
-                # fallback to a tiny font size if it couldn't fit
-                for name in font_names:
-                    try:
-                        font = ImageFont.truetype(name, 10)
-                        if "VariableFont" in name:
-                            font.set_variation_by_name("Regular")
-                        break
-                    except IOError:
-                        continue
-                if not font:
-                    font = ImageFont.load_default()
-                wrapped_text = [caption_text]
-
-            draw = ImageDraw.Draw(img)
-            # bbox of a string with ascenders and descenders to determine line height
-            line_bbox = draw.textbbox((0, 0), "gh", font=font)
-            line_height = line_bbox[3] - line_bbox[1]
-            line_spacing = int(line_height * line_spacing_ratio)
-
-            text_block_height = (len(wrapped_text) * line_height) + (
-                max(0, len(wrapped_text) - 1) * line_spacing
-            )
-
-            padding = int(line_height * padding_scaling_factor)
-
-            bar_height = text_block_height + (1.65 * padding)
-
-            new_img = Image.new(
-                "RGB", (img.width, img.height + int(bar_height)), "white"
-            )
-            new_img.paste(img, (0, int(bar_height)))
-
-            draw = ImageDraw.Draw(new_img)
-
-            text_x = int(img.width * 0.05)
-            current_y = int(((bar_height - text_block_height) / 2))
-
-            for line in wrapped_text:
-                draw.text((text_x, current_y), line, font=font, fill="black")
-                current_y += line_height + line_spacing
-
-            filename = os.path.basename(image_path)
-            output_path = os.path.join(output_dir, f"captioned_{filename}")
-            new_img.save(output_path)
-            return output_path
-
-    # Run the CPU-intensive image processing in a thread pool
-    loop = asyncio.get_event_loop()
-    return await loop.run_in_executor(None, _process_image)
-
-
-def generate_images(captions, path_to_images, output_dir):
+        RenderResult: Output path, worker label, render time and encoded bytes if requested
+    """
+    # Run the CPU-intensive image processing in the executor to avoid blocking
+    loop = asyncio.get_running_loop()
+    result = await loop.run_in_executor(
+        executor, render_image, image_path, caption_text, output_dir, return_bytes
+    )
+    pid = result.worker.split("/")[0]
+    if pid != str(os.getpid()):
+        # Threads share this process's caches, which are read directly
+        _worker_caches[pid] = result.caches
+    for phase, seconds in result.phases.items():
+        record(f"render.{phase}", seconds)
+        metrics.render_seconds.observe(seconds, phase=phase)
+    record("render.image", result.elapsed)
+    metrics.render_seconds.observe(result.elapsed, phase="total")
+    metrics.images_rendered.inc()
+    return result
+
+
+def generate_images(captions, path_to_images, output_dir, workers=None, executor=DEFAULT_EXECUTOR, settings=None):
     """Generate images with captions"""
     logger.progress("Generating images")
-    result = asyncio.run(generate_images_async(captions, path_to_images, output_dir))
+    result = asyncio.run(
+        generate_images_async(captions, path_to_images, output_dir, workers, executor, settings)
+    )
     logger.success(f"Generated {len(result)} images")
     return result
 
 
-async def generate_images_async(captions, path_to_images, output_dir):
-    """Async version of generate_images that processes images concurrently."""
-    image_paths = [
-        os.path.join(path_to_images, file)
-        for file in os.listdir(path_to_images)
-        if file.endswith(SUPPORTED_IMAGE_FORMATS)
-    ]
-    random.shuffle(image_paths)
+def report_worker_throughput(results, wall_time):
+    """
+    Log per-worker render throughput for a batch.
+
+    Args:
+        results: RenderResult objects from a batch
+        wall_time: Wall-clock time of the whole batch in seconds
+    """
+    if not results:
+        return
+
+    per_worker = defaultdict(list)
+    for result in results:
+        per_worker[result.worker].append(result.elapsed)
+
+    for worker, timings in sorted(per_worker.items()):
+        busy = sum(timings)
+        rate = len(timings) / busy if busy > 0 else 0.0
+        logger.info(
+            f"{len(timings)} images in {busy:.2f}s ({rate:.1f} img/s)",
+            prefix=f"worker {worker}",
+        )
+
+    overall = len(results) / wall_time if wall_time > 0 else 0.0
+    logger.info(
+        f"Rendered {len(results)} images on {len(per_worker)} workers "
+        f"in {wall_time:.2f}s ({overall:.1f} img/s)"
+    )
+
+
+async def generate_images_async(captions, path_to_images, output_dir, workers=None, executor=DEFAULT_EXECUTOR, settings=None, image_paths=None):
+    """
+    Async version of generate_images that processes images concurrently.
+
+    image_paths can be passed to reuse a listing of path_to_images across
+    batches instead of scanning the directory again.
+    """
+    if image_paths is None:
+        image_paths = list_source_images(path_to_images)
+    image_paths = random.sample(image_paths, len(image_paths))
 
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
 
+    render_executor = get_render_executor(executor, workers, settings)
+
     tasks = []
     for i, image_path in enumerate(image_paths):
         if i >= len(captions):
             break
 
         caption_text = captions[i]
-        task = process_single_image(image_path, caption_text, output_dir)
+        task = process_single_image(image_path, caption_text, output_dir, render_executor)
         tasks.append(task)
 
-    output_paths = await asyncio.gather(*tasks)
-    return output_paths
+    start_time = time.perf_counter()
+    results = await asyncio.gather(*tasks)
+    report_worker_throughput(results, time.perf_counter() - start_time)
+
+    if settings and settings.source_cache_dir:
+        SourceImageCache(settings.source_cache_dir, settings.source_cache_max_bytes).evict()
+
+    return [result.output_path for result in results]
+
+
+def warm_source_cache(path_to_images, workers=None, executor=DEFAULT_EXECUTOR, settings=None):
+    """
+    Prebuild the source image cache for every image in a directory.
+
+    Args:
+        path_to_images (str): Directory containing source images
+        workers (int, optional): Number of workers to decode with
+        executor (str): Executor kind ("thread" or "process")
+        settings (RenderSettings, optional): Settings with the source cache directory
+
+    Returns:
+        int: Number of images newly added to the cache
+    """
+    settings = settings or RenderSettings(source_cache_dir=str(SOURCE_CACHE_DIR))
+    image_paths = list_source_images(path_to_images)
+    logger.progress(f"Warming source cache for {len(image_paths)} images")
+
+    render_executor = get_render_executor(executor, workers, settings)
+    added = sum(
+        render_executor.map(cache_source_image, image_paths, [DEFAULT_IMAGE_SIZE] * len(image_paths))
+    )
+
+    cache = SourceImageCache(settings.source_cache_dir, settings.source_cache_max_bytes)  # type: ignore
+    removed = cache.evict()
+    if removed:
+        logger.warning(f"Evicted {removed} cached images to stay under {settings.source_cache_max_bytes} bytes")
+
+    logger.success(f"Cached {added} new images ({len(image_paths) - added} already cached)")
+    return added
@@ -0,0 +1,182 @@
+"""
+SQLite job queue for the serve daemon
+
+Jobs are submitted by any local process and claimed by the daemon one at a
+time. A job is a post spec (the same fields as a batch manifest entry) plus
+whether to upload it to TikTok.
+"""
+
+import json
+import time
+import sqlite3
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from .config import JOB_QUEUE_PATH
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    spec TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+"""
+
+
+@dataclass
+class Job:
+    """One queued post"""
+
+    id: int
+    spec: Dict[str, Any]
+    status: str
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+    @classmethod
+    def from_row(cls, row: sqlite3.Row) -> "Job":
+        return cls(
+            id=row["id"],
+            spec=json.loads(row["spec"]),
+            status=row["status"],
+            created_at=row["created_at"],
+            started_at=row["started_at"],
+            finished_at=row["finished_at"],
+            result=json.loads(row["result"]) if row["result"] else None,
+            error=row["error"],
+        )
+
+    def describe(self) -> str:
+        """One-line summary for job listings"""
+        created = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.created_at))
+        line = f"{self.id:>6}  {self.status:<7}  {created}"
+        if self.error:
+            return f"{line}  {self.error}"
+        if self.result:
+            details = [f"{self.result['elapsed']:.2f}s"]
+            if self.result.get("publish_id"):
+                details.append(f"publish_id {self.result['publish_id']}")
+            if self.result.get("output_dir"):
+                details.append(self.result["output_dir"])
+            return f"{line}  {', '.join(details)}"
+        return line
+
+
+class JobQueue:
+    """
+    Jobs stored in SQLite, shared between the daemon and submitting processes.
+
+    Safe to share between threads; all access goes through one connection
+    guarded by a lock.
+    """
+
+    def __init__(self, path: Path = JOB_QUEUE_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Autocommit, so claim() can take the write lock with BEGIN IMMEDIATE
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def submit(self, spec: Dict[str, Any]) -> int:
+        """
+        Add a job to the queue.
+
+        Args:
+            spec: PostSpec fields, plus "upload" to upload the post to TikTok
+
+        Returns:
+            The new job's id
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO jobs (spec, created_at) VALUES (?, ?)",
+                (json.dumps(spec), time.time()),
+            )
+            return cursor.lastrowid  # type: ignore
+
+    def claim(self) -> Optional[Job]:
+        """
+        Take the oldest queued job and mark it running.
+
+        Returns:
+            The claimed job, or None if the queue is empty
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT * FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1"
+                ).fetchone()
+                if row is not None:
+                    started_at = time.time()
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'running', started_at = ? WHERE id = ?",
+                        (started_at, row["id"]),
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        job = Job.from_row(row)
+        job.status, job.started_at = "running", started_at
+        return job
+
+    def finish(self, job_id: int, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None) -> None:
+        """
+        Record a job as done, or failed if an error is given.
+
+        Args:
+            job_id: Job to update
+            result: Outcome details to store
+            error: Why the job failed
+        """
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, result = ?, error = ? WHERE id = ?",
+                ("failed" if error else "done", time.time(), json.dumps(result) if result else None, error, job_id),
+            )
+
+    def requeue_running(self) -> int:
+        """
+        Put jobs left running by a daemon that stopped back in the queue.
+
+        Returns:
+            Number of jobs requeued
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'queued', started_at = NULL WHERE status = 'running'"
+            )
+            return cursor.rowcount
+
+    def get(self, job_id: int) -> Optional[Job]:
+        """Get a job by id"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return Job.from_row(row) if row is not None else None
+
+    def recent(self, limit: int = 20) -> List[Job]:
+        """Get the most recently submitted jobs, newest first"""
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        return [Job.from_row(row) for row in rows]
+
+    def close(self) -> None:
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
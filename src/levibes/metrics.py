@@ -0,0 +1,374 @@
+"""
+Prometheus metrics for repeated and long-running operation
+
+Counters and histograms for rendering, OpenAI, R2 and TikTok calls, in the
+Prometheus text exposition format. Metrics can be served from a local
+/metrics endpoint or written to a file for node_exporter's textfile
+collector. The textfile adds each run's counts to the ones already in the
+file, so totals accumulate across runs. Processes writing the same textfile
+take turns through a lock file next to it.
+"""
+
+import os
+import time
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Seconds; covers a fast render up to a slow OpenAI call
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Seconds; a whole post, from a cached render up to captions, rendering and upload
+JOB_BUCKETS = (0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _series(name: str, label_names: Sequence[str], label_values: Sequence[str], extra: str = "") -> str:
+    labels = [f'{key}="{_escape(value)}"' for key, value in zip(label_names, label_values)]
+    if extra:
+        labels.append(extra)
+    return f"{name}{{{','.join(labels)}}}" if labels else name
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Metric(ABC):
+    """A metric family with a fixed set of label names"""
+
+    kind = "untyped"
+    # Summed with earlier runs when written to a textfile
+    cumulative = True
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name} expects labels {self.label_names}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def sample_names(self) -> Tuple[str, ...]:
+        """Names of the samples this family exposes"""
+        return (self.name,)
+
+    @abstractmethod
+    def samples(self) -> Iterator[Tuple[str, float]]:
+        """Yield (series, value) for every sample"""
+
+
+class Counter(Metric):
+    """Value that only goes up"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        """Increase the counter for a label set"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> Iterator[Tuple[str, float]]:
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            yield _series(self.name, self.label_names, key), value
+
+
+class Gauge(Metric):
+    """Value that is set, replacing earlier ones"""
+
+    kind = "gauge"
+    cumulative = False
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        """Set the gauge for a label set"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def samples(self) -> Iterator[Tuple[str, float]]:
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            yield _series(self.name, self.label_names, key), value
+
+
+class Histogram(Metric):
+    """Distribution of observed values in cumulative buckets"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: counts per bucket (plus +Inf), sum
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        """Record one observation for a label set"""
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            counts[-1] += 1
+            self._values[key] = (counts, total + value)
+
+    def sample_names(self) -> Tuple[str, ...]:
+        return (f"{self.name}_bucket", f"{self.name}_sum", f"{self.name}_count")
+
+    def samples(self) -> Iterator[Tuple[str, float]]:
+        with self._lock:
+            values = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        for key, counts, total in values:
+            for bound, count in zip(self.buckets, counts):
+                yield _series(f"{self.name}_bucket", self.label_names, key, f'le="{bound}"'), count
+            yield _series(f"{self.name}_bucket", self.label_names, key, 'le="+Inf"'), counts[-1]
+            yield _series(f"{self.name}_sum", self.label_names, key), total
+            yield _series(f"{self.name}_count", self.label_names, key), counts[-1]
+
+
+def parse_samples(text: str) -> Dict[str, float]:
+    """
+    Read the samples from Prometheus text exposition format.
+
+    Args:
+        text: Exposition text, as written by Registry.render()
+
+    Returns:
+        Dictionary mapping each series to its value
+    """
+    samples = {}
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        series, _, value = line.rpartition(" ")
+        try:
+            samples[series] = float(value)
+        except ValueError:
+            continue
+    return samples
+
+
+def read_textfile(path: str) -> Dict[str, float]:
+    """
+    Read the samples from a metrics textfile.
+
+    Args:
+        path: File written by Registry.write_textfile()
+
+    Returns:
+        Dictionary mapping each series to its value (empty if the file doesn't exist)
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return parse_samples(f.read())
+    except OSError:
+        return {}
+
+
+@contextmanager
+def textfile_lock(path: str) -> Iterator[None]:
+    """
+    Hold an exclusive lock on a textfile's sidecar lock file.
+
+    Without fcntl (Windows) this doesn't lock, so each process there needs
+    its own textfile.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with open(f"{path}.lock", "a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class Registry:
+    """Set of metric families rendered together"""
+
+    def __init__(self):
+        self._metrics: List[Metric] = []
+        # Cumulative samples this process has already added to each textfile
+        self._written: Dict[str, Dict[str, float]] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labels))  # type: ignore
+
+    def gauge(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labels))  # type: ignore
+
+    def histogram(self, name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labels, buckets))  # type: ignore
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Current samples of every metric, keyed by metric name"""
+        return {metric.name: dict(metric.samples()) for metric in self._metrics}
+
+    def render(self, previous: Optional[Dict[str, float]] = None, current: Optional[Dict[str, Dict[str, float]]] = None) -> str:
+        """
+        Render every metric in the text exposition format.
+
+        Args:
+            previous: Samples from an earlier run to add to counters and
+                histograms (gauges take the current value)
+            current: Snapshot to render instead of the live values
+
+        Returns:
+            Exposition text
+        """
+        previous = previous or {}
+        current = current or self.snapshot()
+        lines = []
+        for metric in self._metrics:
+            values = dict(current.get(metric.name, {}))
+            if metric.cumulative:
+                prefixes = metric.sample_names()
+                for series, value in previous.items():
+                    if series.partition("{")[0] in prefixes:
+                        values[series] = values.get(series, 0) + value
+            if not values:
+                continue
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(f"{series} {_format_value(value)}" for series, value in values.items())
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: str) -> None:
+        """
+        Write metrics for node_exporter's textfile collector.
+
+        Counts already in the file are added to this run's, and the file is
+        replaced atomically so the collector never reads a partial file.
+        The read and replace happen under textfile_lock(), so runs writing
+        the same file at once don't lose each other's counts. A process can
+        write the same file repeatedly (the serve daemon does after every
+        job); only counts since its last write are added.
+
+        Args:
+            path: File to write, normally ending in .prom
+        """
+        with textfile_lock(path):
+            last_run.set(time.time())
+            current = self.snapshot()
+            previous = read_textfile(path)
+            # This process's earlier writes are already in the file
+            for series, value in self._written.get(path, {}).items():
+                if series in previous:
+                    previous[series] -= value
+
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(self.render(previous, current))
+            os.replace(tmp_path, path)
+            self._written[path] = {
+                series: value
+                for metric in self._metrics if metric.cumulative
+                for series, value in current[metric.name].items()
+            }
+
+    def start_http_server(self, port: int, host: str = "127.0.0.1"):
+        """
+        Serve the metrics at http://host:port/metrics from a background thread.
+
+        Returns:
+            The running server (call shutdown() to stop it)
+        """
+        # Only needed when serving, so plain runs don't import the HTTP stack
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        registry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=server.serve_forever, name="levibes-metrics", daemon=True).start()
+        return server
+
+
+registry = Registry()
+
+images_rendered = registry.counter(
+    "levibes_images_rendered_total", "Captioned images rendered"
+)
+render_seconds = registry.histogram(
+    "levibes_render_seconds", "Time to render one image, in total and per phase", ("phase",)
+)
+openai_requests = registry.counter(
+    "levibes_openai_requests_total", "OpenAI requests by outcome (cache hits are not counted)", ("model", "outcome")
+)
+openai_seconds = registry.histogram(
+    "levibes_openai_request_seconds", "OpenAI request latency", ("model",)
+)
+openai_tokens = registry.counter(
+    "levibes_openai_tokens_total", "OpenAI tokens used", ("model", "kind")
+)
+r2_bytes = registry.counter(
+    "levibes_r2_upload_bytes_total", "Bytes uploaded to R2"
+)
+r2_seconds = registry.histogram(
+    "levibes_r2_upload_seconds", "Time to upload one object to R2"
+)
+tiktok_responses = registry.counter(
+    "levibes_tiktok_responses_total",
+    "TikTok API responses by HTTP status and TikTok error code (status is the exception name when no response arrived)",
+    ("endpoint", "status", "code"),
+)
+tiktok_seconds = registry.histogram(
+    "levibes_tiktok_request_seconds", "TikTok API request latency", ("endpoint",)
+)
+jobs = registry.counter(
+    "levibes_jobs_total", "Jobs processed by the serve daemon, by status", ("status",)
+)
+job_seconds = registry.histogram(
+    "levibes_job_seconds", "Time from claiming a job to finishing it", buckets=JOB_BUCKETS
+)
+job_wait_seconds = registry.histogram(
+    "levibes_job_queue_wait_seconds", "Time jobs spent queued before being claimed", buckets=JOB_BUCKETS
+)
+last_run = registry.gauge(
+    "levibes_last_run_timestamp_seconds", "When metrics were last written"
+)
@@ -0,0 +1,146 @@
+"""
+Streaming render-to-upload pipeline
+
+Renders captioned images into memory and hands each one to the R2 uploader
+as soon as it is encoded, so rendering and uploading overlap and nothing has
+to be written to or re-read from disk.
+"""
+
+import os
+import time
+import random
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from .config import DEFAULT_EXECUTOR, R2_HEAD_CHECK, R2_MAX_POOL_CONNECTIONS, R2_UPLOAD_CONCURRENCY
+from .generate_images import (
+    get_render_executor,
+    process_single_image,
+    report_worker_throughput,
+)
+from .sources import SourceImageCache, list_source_images
+from .upload import CloudflareR2Uploader, load_upload_image, wrap_upload_bytes
+from .utils.logger import logger
+
+
+async def stream_render_to_r2_async(captions, path_to_images, output_dir=None, outro_image=None, workers=None, executor=DEFAULT_EXECUTOR, settings=None, r2_uploader=None, upload_concurrency=R2_UPLOAD_CONCURRENCY, image_paths=None, verify_uploads=R2_HEAD_CHECK) -> List[str]:
+    """
+    Render captioned images in memory and upload each one to R2 as it finishes.
+
+    Args:
+        captions: Captions to render, one per image
+        path_to_images: Directory containing source images
+        output_dir: Directory to also save rendered images to (None to skip disk)
+        outro_image: Optional image appended after the rendered slides
+        workers: Number of render workers
+        executor: Executor kind ("thread" or "process")
+        settings: Render settings
+        r2_uploader: Uploader to use (created from the environment if omitted)
+        upload_concurrency: Maximum number of uploads in flight
+        image_paths: Existing listing of path_to_images to reuse
+        verify_uploads: Check manifest entries against the bucket (only used
+            when r2_uploader is omitted)
+
+    Returns:
+        Public URLs of the uploaded images, in caption order
+    """
+    r2_uploader = r2_uploader or CloudflareR2Uploader(
+        max(upload_concurrency, R2_MAX_POOL_CONNECTIONS), head_check=verify_uploads
+    )
+
+    if image_paths is None:
+        image_paths = list_source_images(path_to_images)
+    image_paths = random.sample(image_paths, len(image_paths))
+    jobs = list(zip(image_paths, captions))
+
+    render_executor = get_render_executor(executor, workers, settings)
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    urls: List[Optional[str]] = [None] * len(jobs)
+
+    async def render(index, image_path, caption_text):
+        result = await process_single_image(
+            image_path, caption_text, output_dir, render_executor, return_bytes=True
+        )
+        await queue.put((index, result))
+        return result
+
+    upload_executor = ThreadPoolExecutor(
+        max_workers=upload_concurrency, thread_name_prefix="levibes-upload"
+    )
+
+    async def upload():
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            index, result = item
+            # Converted in the upload thread, as the disk path does for PNGs
+            urls[index] = await loop.run_in_executor(
+                upload_executor,
+                lambda: r2_uploader.upload_fileobj(
+                    *wrap_upload_bytes(result.data, result.filename, result.content_type)
+                ),
+            )
+
+    async def render_all():
+        results = await asyncio.gather(
+            *(render(index, path, caption) for index, (path, caption) in enumerate(jobs))
+        )
+        report_worker_throughput(results, time.perf_counter() - start_time)
+        for _ in range(upload_concurrency):
+            await queue.put(None)
+
+    async def upload_outro():
+        return await loop.run_in_executor(
+            upload_executor,
+            lambda: r2_uploader.upload_fileobj(*load_upload_image(outro_image)),
+        )
+
+    logger.progress("Rendering and uploading images")
+    start_time = time.perf_counter()
+    try:
+        # One task group, so the first failed upload cancels the rendering still to do
+        async with asyncio.TaskGroup() as group:
+            # The outro doesn't depend on rendering, so upload it alongside
+            outro_upload = None
+            if outro_image and os.path.exists(outro_image):
+                outro_upload = group.create_task(upload_outro())
+            elif outro_image:
+                logger.warning(f"Outro image not found: {outro_image}")
+
+            group.create_task(render_all())
+            # A fixed set of consumers bounds the number of uploads in flight
+            for _ in range(upload_concurrency):
+                group.create_task(upload())
+    except BaseExceptionGroup as errors:
+        # Callers handle single errors, so raise the first one
+        raise errors.exceptions[0] from None
+    finally:
+        upload_executor.shutdown(wait=False, cancel_futures=True)
+
+    if outro_upload is not None:
+        urls.append(outro_upload.result())
+
+    if settings and settings.source_cache_dir:
+        SourceImageCache(settings.source_cache_dir, settings.source_cache_max_bytes).evict()
+
+    logger.success(f"Uploaded {len(urls)} images to cloud storage")
+    return urls  # type: ignore
+
+
+def stream_render_to_r2(captions, path_to_images, output_dir=None, outro_image=None, workers=None, executor=DEFAULT_EXECUTOR, settings=None, upload_concurrency=R2_UPLOAD_CONCURRENCY, verify_uploads=R2_HEAD_CHECK) -> List[str]:
+    """Render captioned images in memory and upload them to R2"""
+    return asyncio.run(
+        stream_render_to_r2_async(
+            captions,
+            path_to_images,
+            output_dir,
+            outro_image,
+            workers,
+            executor,
+            settings,
+            upload_concurrency=upload_concurrency,
+            verify_uploads=verify_uploads,
+        )
+    )
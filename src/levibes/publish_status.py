@@ -0,0 +1,157 @@
+"""
+Async polling of TikTok publish status for batches of drafts
+"""
+
+import time
+import asyncio
+from dataclasses import dataclass
+from typing import List, Optional
+from .config import (
+    PUBLISH_POLL_BACKOFF,
+    PUBLISH_POLL_CONCURRENCY,
+    PUBLISH_POLL_INITIAL_INTERVAL,
+    PUBLISH_POLL_MAX_INTERVAL,
+    PUBLISH_POLL_TIMEOUT,
+)
+from .utils.logger import logger
+
+# PULL_FROM_URL drafts end in the user's inbox; direct posts end as PUBLISH_COMPLETE
+SUCCESS_STATUSES = {"SEND_TO_USER_INBOX", "PUBLISH_COMPLETE"}
+FAILURE_STATUSES = {"FAILED"}
+MAX_CONSECUTIVE_ERRORS = 3
+
+
+@dataclass
+class PublishResult:
+    """Final status of one TikTok publish"""
+
+    publish_id: str
+    status: str
+    fail_reason: Optional[str] = None
+    elapsed: float = 0.0
+    polls: int = 0
+
+    @property
+    def succeeded(self) -> bool:
+        return self.status in SUCCESS_STATUSES
+
+
+async def poll_publish_status(
+    uploader,
+    publish_id: str,
+    semaphore: Optional[asyncio.Semaphore] = None,
+    initial_interval: float = PUBLISH_POLL_INITIAL_INTERVAL,
+    max_interval: float = PUBLISH_POLL_MAX_INTERVAL,
+    backoff: float = PUBLISH_POLL_BACKOFF,
+    timeout: float = PUBLISH_POLL_TIMEOUT,
+) -> PublishResult:
+    """
+    Poll one publish until it reaches a final status.
+
+    The interval grows while the status stays the same and resets whenever
+    it changes, so active uploads are checked often and stalled ones rarely.
+
+    Args:
+        uploader: Authenticated TikTokUploader
+        publish_id: Publish ID returned when the draft was created
+        semaphore: Limits concurrent status requests across publishes
+        initial_interval: First delay between polls in seconds
+        max_interval: Longest delay between polls in seconds
+        backoff: Factor the delay grows by while the status is unchanged
+        timeout: Give up after this many seconds
+
+    Returns:
+        PublishResult with the final (or last seen) status
+    """
+    semaphore = semaphore or asyncio.Semaphore(1)
+    start_time = time.perf_counter()
+    interval = initial_interval
+    last_status = None
+    polls = 0
+    errors = 0
+
+    while True:
+        polls += 1
+        async with semaphore:
+            try:
+                response = await asyncio.to_thread(uploader.get_upload_status, publish_id)
+                errors = 0
+            except Exception as e:
+                errors += 1
+                if errors >= MAX_CONSECUTIVE_ERRORS:
+                    return PublishResult(publish_id, "ERROR", str(e), time.perf_counter() - start_time, polls)
+                response = None
+
+        if response is not None:
+            data = response.get("data", {})
+            status = data.get("status", "UNKNOWN")
+            if status in SUCCESS_STATUSES or status in FAILURE_STATUSES:
+                return PublishResult(
+                    publish_id,
+                    status,
+                    data.get("fail_reason"),
+                    time.perf_counter() - start_time,
+                    polls,
+                )
+
+            if status != last_status:
+                interval = initial_interval
+                last_status = status
+            else:
+                interval = min(max_interval, interval * backoff)
+
+        elapsed = time.perf_counter() - start_time
+        if elapsed + interval > timeout:
+            return PublishResult(publish_id, last_status or "TIMEOUT", "Timed out waiting for TikTok", elapsed, polls)
+
+        await asyncio.sleep(interval)
+
+
+async def poll_publish_statuses(uploader, publish_ids: List[str], max_concurrency: int = PUBLISH_POLL_CONCURRENCY, **kwargs) -> List[PublishResult]:
+    """
+    Poll many publishes concurrently until each reaches a final status.
+
+    Args:
+        uploader: Authenticated TikTokUploader
+        publish_ids: Publish IDs to track
+        max_concurrency: Maximum number of status requests in flight
+        **kwargs: Polling options passed to poll_publish_status
+
+    Returns:
+        PublishResult for each publish ID, in the same order
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    return list(
+        await asyncio.gather(
+            *(poll_publish_status(uploader, publish_id, semaphore, **kwargs) for publish_id in publish_ids)
+        )
+    )
+
+
+def wait_for_publish(uploader, publish_ids: List[str], **kwargs) -> List[PublishResult]:
+    """
+    Wait for publishes to finish and log the final status of each.
+
+    Args:
+        uploader: Authenticated TikTokUploader
+        publish_ids: Publish IDs to track
+        **kwargs: Options passed to poll_publish_statuses
+
+    Returns:
+        PublishResult for each publish ID, in the same order
+    """
+    logger.progress(f"Waiting for TikTok to process {len(publish_ids)} draft(s)")
+    results = asyncio.run(poll_publish_statuses(uploader, publish_ids, **kwargs))
+    log_publish_results(results)
+    return results
+
+
+def log_publish_results(results: List[PublishResult]) -> None:
+    """Log the final status of each publish"""
+    for result in results:
+        message = f"{result.status} after {result.elapsed:.1f}s ({result.polls} checks)"
+        if result.succeeded:
+            logger.success(message, prefix=result.publish_id)
+        else:
+            reason = f": {result.fail_reason}" if result.fail_reason else ""
+            logger.warning(f"{message}{reason}", prefix=result.publish_id)
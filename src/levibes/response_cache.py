@@ -0,0 +1,210 @@
+"""
+On-disk cache of OpenAI structured responses
+"""
+
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+from .config import (
+    RESPONSE_CACHE_DIR,
+    RESPONSE_CACHE_MAX_BYTES,
+    RESPONSE_CACHE_TTL,
+)
+
+CACHE_SUFFIX = ".json"
+RESPONSE_CACHE_VERSION = 1
+
+
+# Occurrence counts for the current run, when narrower than the process
+_scope_occurrences: ContextVar[Optional[Counter]] = ContextVar("response_cache_occurrences", default=None)
+
+
+class CacheMissError(LookupError):
+    """Raised in replay mode when a response is not in the cache."""
+
+
+@contextmanager
+def response_scope() -> Iterator[None]:
+    """
+    Count repeated requests from slot 0 again inside this block.
+
+    Used for each batch or serve job, so a long-running process asks for the
+    same slots as a fresh run would. Tasks and caption service requests
+    started inside the block inherit the scope.
+    """
+    token = _scope_occurrences.set(Counter())
+    try:
+        yield
+    finally:
+        _scope_occurrences.reset(token)
+
+
+class ResponseCache:
+    """
+    Directory of parsed OpenAI responses keyed by the full request.
+
+    Identical requests made more than once in a run (e.g. retries after a
+    rejected caption set) are stored in separate slots, so replaying a run
+    returns the same sequence of responses instead of the first one again.
+    A run is the process, or the enclosing response_scope().
+    """
+
+    def __init__(self, directory: Path = RESPONSE_CACHE_DIR, ttl: float = RESPONSE_CACHE_TTL, max_bytes: int = RESPONSE_CACHE_MAX_BYTES, replay: bool = False):
+        self.directory = Path(directory)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.replay = replay
+        self._occurrences: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def key(self, model: str, temperature: float, prompt: str, schema: Dict[str, Any]) -> str:
+        """
+        Build the cache key for a request.
+
+        Each call with the same request in a run gets the next slot, starting at 0.
+
+        Args:
+            model: Model name
+            temperature: Sampling temperature
+            prompt: Full prompt text
+            schema: JSON schema of the structured output
+
+        Returns:
+            Hex digest identifying the request and its slot
+        """
+        material = json.dumps(
+            [model, temperature, prompt, schema, RESPONSE_CACHE_VERSION],
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        request = hashlib.sha256(material.encode("utf-8")).hexdigest()
+        occurrences = _scope_occurrences.get()
+        if occurrences is None:
+            occurrences = self._occurrences
+        with self._lock:
+            slot = occurrences[request]
+            occurrences[request] += 1
+        return f"{request}-{slot}"
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}{CACHE_SUFFIX}"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a cached response.
+
+        Args:
+            key: Cache key from key()
+
+        Returns:
+            Parsed response fields, or None on a miss or an expired entry
+        """
+        path = self._path(key)
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+        # Replays serve whatever was recorded, however old
+        if not self.replay and time.time() - entry.get("created_at", 0) > self.ttl:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+            return None
+
+        # Refresh the modification time so eviction drops least recently used entries
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry.get("output")
+
+    def put(self, key: str, output: Dict[str, Any]) -> None:
+        """
+        Store a response.
+
+        Args:
+            key: Cache key from key()
+            output: Parsed response fields
+        """
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"created_at": time.time(), "output": output}, f, ensure_ascii=False)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            pass
+
+    def evict(self) -> int:
+        """
+        Delete expired entries, then least recently used ones until the cache fits in max_bytes.
+
+        Returns:
+            Number of entries removed
+        """
+        if not self.directory.exists():
+            return 0
+
+        now = time.time()
+        entries = []
+        removed = 0
+        for entry in self.directory.glob(f"*{CACHE_SUFFIX}"):
+            try:
+                stat = entry.stat()
+                if not self.replay:
+                    created_at = json.loads(entry.read_text(encoding="utf-8")).get("created_at", 0)
+                    if now - created_at > self.ttl:
+                        entry.unlink()
+                        removed += 1
+                        continue
+            except (OSError, ValueError):
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries, key=lambda item: item[0]):
+            if total <= self.max_bytes:
+                break
+            try:
+                entry.unlink()
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+
+_response_cache: Optional[ResponseCache] = None
+
+
+def configure_response_cache(directory: Optional[str] = None, ttl: float = RESPONSE_CACHE_TTL, max_bytes: int = RESPONSE_CACHE_MAX_BYTES, replay: bool = False) -> Optional[ResponseCache]:
+    """
+    Replace the process-wide response cache.
+
+    Args:
+        directory: Cache directory (None disables caching)
+        ttl: Seconds a cached response stays valid
+        max_bytes: Total size the cache is evicted down to
+        replay: Serve only from the cache and never call the API
+
+    Returns:
+        The new response cache, or None if disabled
+    """
+    global _response_cache
+    _response_cache = ResponseCache(directory, ttl, max_bytes, replay) if directory else None
+    return _response_cache
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Get the process-wide response cache, or None if disabled."""
+    return _response_cache
@@ -0,0 +1,223 @@
+"""
+Headless service mode
+
+`levibes serve` sets up the render workers, fonts, source image cache,
+OpenAI client and R2/TikTok clients once, then processes jobs from the
+SQLite job queue until stopped. A job's latency is only its own captions,
+rendering and upload. Jobs are added from any local process with
+`levibes submit`.
+
+Run one daemon per queue: jobs left running when a daemon starts are taken
+to be from one that stopped, and are queued again.
+"""
+
+import os
+import time
+import signal
+import asyncio
+from typing import TYPE_CHECKING, Optional
+from . import metrics
+from .batch import BatchState, PostSpec, post_from_dict, run_batch_async
+from .config import RESPONSE_CACHE_DIR
+from .fonts import font_fingerprint, resolve_font_path
+from .generate_images import RenderSettings, get_render_executor, warm_source_cache
+from .job_queue import Job, JobQueue
+from .response_cache import configure_response_cache
+from .utils.logger import logger
+
+if TYPE_CHECKING:
+    from .upload import TikTokUploader
+
+
+def warm_fonts() -> None:
+    """Find and hash the caption font; run in each render worker."""
+    resolve_font_path()
+    font_fingerprint()
+
+
+def warm_up(args) -> Optional["TikTokUploader"]:
+    """
+    Create the workers and clients jobs use, so no job pays for them.
+
+    Args:
+        args: Parsed serve arguments
+
+    Returns:
+        TikTok uploader, or None if uploads aren't configured
+    """
+    settings = RenderSettings.from_args(args)
+    warm_fonts()
+    # Render workers ignore SIGINT, so Ctrl+C stops the daemon cleanly instead
+    # of interrupting workers that running jobs still need
+    executor = get_render_executor(args.executor, args.workers, settings)
+    # Start every worker process now; each loads the font once
+    futures = [executor.submit(warm_fonts) for _ in range(args.workers or os.cpu_count() or 1)] if args.executor == "process" else []
+    for future in futures:
+        future.result()
+    if args.source_cache:
+        warm_source_cache(args.images_dir, args.workers, args.executor, settings)
+
+    if os.environ.get("OPENAI_API_KEY"):
+        from .caption_generation import get_caption_service
+
+        get_caption_service()
+    else:
+        logger.warning("OPENAI_API_KEY is not set, so jobs with AI captions will fail")
+
+    from .tiktok_api import get_api_client
+    from .upload import TikTokUploadError, TikTokUploader, validate_r2_env, validate_tiktok_env
+
+    try:
+        client_id, client_secret = validate_tiktok_env()
+        validate_r2_env()
+    except TikTokUploadError as e:
+        logger.warning(f"Upload jobs will fail: {e}")
+        return None
+
+    get_api_client()
+    uploader = TikTokUploader(client_id, client_secret, args.upload_concurrency, verify_uploads=args.verify_uploads)
+    logger.progress("Authenticating with TikTok")
+    try:
+        uploader.authenticate(interactive=False)
+    except TikTokUploadError as e:
+        # Jobs check the token store again, so logging in from another shell is enough
+        logger.warning(f"Upload jobs will fail until TikTok is authenticated: {e}")
+    return uploader
+
+
+def refresh_token(uploader: "TikTokUploader") -> None:
+    """
+    Use the stored access token, refreshing it once it has expired.
+
+    Never opens the browser login, which would block every job behind it.
+
+    Raises:
+        TikTokUploadError: If the stored token can't be used or refreshed
+    """
+    from .token_store import is_access_token_valid
+
+    token = uploader.token_store.load() if uploader.token_store else None
+    if is_access_token_valid(token):
+        uploader.access_token = token["access_token"]  # type: ignore
+    else:
+        uploader.authenticate(interactive=False)
+
+
+class JobRunner:
+    """Runs queued jobs with shared state, a few at a time"""
+
+    def __init__(self, args, queue: JobQueue, uploader: Optional["TikTokUploader"] = None):
+        self.args = args
+        self.queue = queue
+        self.uploader = uploader
+        self.state = BatchState(args.caption_library)
+        self.defaults = PostSpec(images_dir=args.images_dir, model=args.model)
+        self.stopping = asyncio.Event()
+        self._auth_lock = asyncio.Lock()
+        self._running = 0
+
+    def stop(self) -> None:
+        """Stop claiming jobs; jobs already running still finish."""
+        if not self.stopping.is_set():
+            logger.progress(f"Stopping after {self._running} running jobs finish (interrupt again to stop now)")
+            self.stopping.set()
+
+    async def run_job(self, job: Job) -> None:
+        prefix = f"job {job.id}"
+        spec = dict(job.spec)
+        upload = bool(spec.pop("upload", False))
+        queue_wait = (job.started_at or job.created_at) - job.created_at
+        logger.info(f"Started after {queue_wait:.2f}s in the queue", prefix=prefix)
+
+        start_time = time.perf_counter()
+        result = None
+        try:
+            post = post_from_dict(spec, self.defaults)
+            if upload:
+                if self.uploader is None:
+                    raise ValueError("uploads are not configured; set the TikTok and R2 variables and restart")
+                async with self._auth_lock:
+                    await asyncio.to_thread(refresh_token, self.uploader)
+            result = (await run_batch_async([post], self.args, self.uploader if upload else None, self.state))[0]
+            error = result.error
+        except Exception as e:
+            error = str(e)
+        elapsed = time.perf_counter() - start_time
+
+        details = {"elapsed": round(elapsed, 3), "queue_wait": round(queue_wait, 3)}
+        if result is not None:
+            details.update(output_dir=result.output_dir, image_urls=result.image_urls, publish_id=result.publish_id)
+        await asyncio.to_thread(self.queue.finish, job.id, details, error)
+
+        metrics.jobs.inc(status="failed" if error else "done")
+        metrics.job_seconds.observe(elapsed)
+        metrics.job_wait_seconds.observe(queue_wait)
+        if self.args.metrics_textfile:
+            metrics.registry.write_textfile(self.args.metrics_textfile)
+
+        if error:
+            logger.error(f"Failed after {elapsed:.2f}s: {error}", prefix=prefix)
+        else:
+            logger.success(f"Done in {elapsed:.2f}s", prefix=prefix)
+
+    async def worker(self) -> None:
+        while not self.stopping.is_set():
+            job = await asyncio.to_thread(self.queue.claim)
+            if job is None:
+                try:
+                    await asyncio.wait_for(self.stopping.wait(), self.args.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            self._running += 1
+            try:
+                await self.run_job(job)
+            finally:
+                self._running -= 1
+
+    async def run(self) -> None:
+        """Process jobs until stop() is called or the process is signalled."""
+        loop = asyncio.get_running_loop()
+
+        def on_signal():
+            # A second signal gets the default handling and stops at once
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                loop.remove_signal_handler(sig)
+            self.stop()
+
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, on_signal)
+        await asyncio.gather(*(self.worker() for _ in range(self.args.concurrency)))
+
+
+def run_server(args) -> None:
+    """
+    Run the serve daemon until it is interrupted.
+
+    Args:
+        args: Parsed serve arguments
+    """
+    if args.response_cache:
+        response_cache = configure_response_cache(str(RESPONSE_CACHE_DIR), args.response_cache_ttl)
+    if args.metrics_port:
+        metrics.registry.start_http_server(args.metrics_port)
+
+    start_time = time.perf_counter()
+    uploader = warm_up(args)
+
+    queue = JobQueue(args.queue)
+    requeued = queue.requeue_running()
+    if requeued:
+        logger.warning(f"Requeued {requeued} jobs left running by a previous daemon")
+    logger.success(
+        f"Ready in {time.perf_counter() - start_time:.2f}s; processing up to {args.concurrency} jobs at once from {args.queue}"
+    )
+
+    try:
+        asyncio.run(JobRunner(args, queue, uploader).run())
+    finally:
+        queue.close()
+        if args.response_cache:
+            response_cache.evict()  # type: ignore
+    logger.success("Stopped")
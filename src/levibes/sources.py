@@ -0,0 +1,289 @@
+"""
+Source image loading with a preprocessed on-disk cache
+"""
+
+import os
+import hashlib
+import tempfile
+from pathlib import Path
+from typing import List, Optional, Tuple
+from PIL import Image
+from .config import (
+    DEFAULT_IMAGE_SIZE,
+    DEFAULT_RESAMPLE,
+    JPEG_DRAFT,
+    SOURCE_CACHE_MAX_BYTES,
+    SUPPORTED_IMAGE_FORMATS,
+)
+from .utils.timing import span
+
+# Bump when preprocessing changes so stale cache entries are ignored
+SOURCE_CACHE_VERSION = 2
+CACHE_SUFFIX = ".rgb"
+
+RESAMPLE_FILTERS = {
+    "nearest": Image.Resampling.NEAREST,
+    "box": Image.Resampling.BOX,
+    "bilinear": Image.Resampling.BILINEAR,
+    "hamming": Image.Resampling.HAMMING,
+    "bicubic": Image.Resampling.BICUBIC,
+    "lanczos": Image.Resampling.LANCZOS,
+}
+
+
+def list_source_images(directory: str) -> List[str]:
+    """
+    List source images in a directory.
+
+    Args:
+        directory: Directory containing source images
+
+    Returns:
+        List of image file paths
+    """
+    with span("images.list"):
+        return [
+            os.path.join(directory, file)
+            for file in os.listdir(directory)
+            if file.endswith(SUPPORTED_IMAGE_FORMATS)
+        ]
+
+
+def prepare_source_image(image_path: str, size: Tuple[int, int] = DEFAULT_IMAGE_SIZE, resample: str = DEFAULT_RESAMPLE, jpeg_draft: bool = JPEG_DRAFT) -> Image.Image:
+    """
+    Decode a source image, center-crop it to a square and resize it.
+
+    Large JPEGs are decoded with Pillow's draft mode at the smallest DCT
+    scale (1/2, 1/4 or 1/8) that still covers the target size, which cuts
+    both decode time and peak memory.
+
+    Args:
+        image_path: Path to the source image
+        size: Target size in pixels
+        resample: Name of the resampling filter used to resize
+        jpeg_draft: Whether to decode JPEGs at a reduced scale
+
+    Returns:
+        RGB image of the target size
+    """
+    with Image.open(image_path) as img:
+        if jpeg_draft and img.format == "JPEG":
+            # The square crop must still cover the target after reduction
+            side = max(size)
+            img.draft("RGB", (side, side))
+
+        width, height = img.size
+        if width != height:
+            crop_size = min(width, height)
+            left = (width - crop_size) / 2
+            top = (height - crop_size) / 2
+            right = (width + crop_size) / 2
+            bottom = (height + crop_size) / 2
+            img = img.crop((left, top, right, bottom))
+
+        img = img.resize(size, RESAMPLE_FILTERS[resample])
+        return img.convert("RGB")
+
+
+class SourceImageCache:
+    """Directory of preprocessed source images stored as raw RGB tiles."""
+
+    def __init__(self, directory: str, max_bytes: int = SOURCE_CACHE_MAX_BYTES, resample: str = DEFAULT_RESAMPLE, jpeg_draft: bool = JPEG_DRAFT):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.resample = resample
+        self.jpeg_draft = jpeg_draft
+
+    def key(self, image_path: str, size: Tuple[int, int]) -> str:
+        """
+        Build the cache key for a source image.
+
+        The key changes whenever the file is modified, so stale tiles are
+        never served.
+        """
+        stat = os.stat(image_path)
+        material = "|".join(
+            str(part)
+            for part in (
+                os.path.abspath(image_path),
+                stat.st_mtime_ns,
+                stat.st_size,
+                size[0],
+                size[1],
+                self.resample,
+                self.jpeg_draft,
+                SOURCE_CACHE_VERSION,
+            )
+        )
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}{CACHE_SUFFIX}"
+
+    def contains(self, image_path: str, size: Tuple[int, int] = DEFAULT_IMAGE_SIZE) -> bool:
+        """Check whether a complete tile for the source image is cached."""
+        try:
+            return self._path(self.key(image_path, size)).stat().st_size == size[0] * size[1] * 3
+        except OSError:
+            return False
+
+    def get(self, image_path: str, size: Tuple[int, int] = DEFAULT_IMAGE_SIZE) -> Optional[Image.Image]:
+        """
+        Get a cached preprocessed image.
+
+        Args:
+            image_path: Path to the source image
+            size: Target size in pixels
+
+        Returns:
+            Cached RGB image, or None on a miss
+        """
+        path = self._path(self.key(image_path, size))
+        try:
+            data = path.read_bytes()
+        except OSError:
+            return None
+
+        if len(data) != size[0] * size[1] * 3:
+            return None
+
+        # Refresh the modification time so eviction drops least recently used tiles
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return Image.frombytes("RGB", size, data)
+
+    def put(self, image_path: str, size: Tuple[int, int], img: Image.Image) -> None:
+        """
+        Store a preprocessed image.
+
+        Args:
+            image_path: Path to the source image
+            size: Target size in pixels
+            img: Preprocessed RGB image
+        """
+        path = self._path(self.key(image_path, size))
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            # Write atomically so concurrent workers never read a partial tile
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(img.tobytes())
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
+
+    def load(self, image_path: str, size: Tuple[int, int] = DEFAULT_IMAGE_SIZE) -> Tuple[Image.Image, bool]:
+        """
+        Load a preprocessed image, decoding and caching it on a miss.
+
+        Args:
+            image_path: Path to the source image
+            size: Target size in pixels
+
+        Returns:
+            Tuple of (RGB image, whether it was served from the cache)
+        """
+        img = self.get(image_path, size)
+        if img is not None:
+            return img, True
+
+        img = prepare_source_image(image_path, size, self.resample, self.jpeg_draft)
+        self.put(image_path, size, img)
+        return img, False
+
+    def total_bytes(self) -> int:
+        """Get the total size of all cached tiles in bytes."""
+        return sum(entry.stat().st_size for entry in self.directory.glob(f"*{CACHE_SUFFIX}"))
+
+    def evict(self) -> int:
+        """
+        Delete least recently used tiles until the cache fits in max_bytes.
+
+        Returns:
+            Number of tiles removed
+        """
+        if not self.directory.exists():
+            return 0
+
+        entries = []
+        for entry in self.directory.glob(f"*{CACHE_SUFFIX}"):
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry))
+
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, entry in sorted(entries, key=lambda item: item[0]):
+            if total <= self.max_bytes:
+                break
+            try:
+                entry.unlink()
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+
+_source_cache: Optional[SourceImageCache] = None
+_resample = DEFAULT_RESAMPLE
+_jpeg_draft = JPEG_DRAFT
+
+
+def configure_source_cache(directory: Optional[str] = None, max_bytes: int = SOURCE_CACHE_MAX_BYTES, resample: str = DEFAULT_RESAMPLE, jpeg_draft: bool = JPEG_DRAFT) -> Optional[SourceImageCache]:
+    """
+    Set the process-wide source image loading options and cache.
+
+    Args:
+        directory: Cache directory (None disables the cache)
+        max_bytes: Maximum total size of the cache in bytes
+        resample: Name of the resampling filter used to resize
+        jpeg_draft: Whether to decode JPEGs at a reduced scale
+
+    Returns:
+        The configured cache, or None if disabled
+    """
+    global _source_cache, _resample, _jpeg_draft
+    _resample = resample
+    _jpeg_draft = jpeg_draft
+    _source_cache = SourceImageCache(directory, max_bytes, resample, jpeg_draft) if directory else None
+    return _source_cache
+
+
+def load_source_image(image_path: str, size: Tuple[int, int] = DEFAULT_IMAGE_SIZE) -> Image.Image:
+    """
+    Load a preprocessed source image, using the source cache if configured.
+
+    Args:
+        image_path: Path to the source image
+        size: Target size in pixels
+
+    Returns:
+        RGB image of the target size
+    """
+    if _source_cache is None:
+        return prepare_source_image(image_path, size, _resample, _jpeg_draft)
+    return _source_cache.load(image_path, size)[0]
+
+
+def cache_source_image(image_path: str, size: Tuple[int, int] = DEFAULT_IMAGE_SIZE) -> bool:
+    """
+    Make sure a source image is in the configured source cache.
+
+    Args:
+        image_path: Path to the source image
+        size: Target size in pixels
+
+    Returns:
+        True if the image was decoded and added, False if it was already cached
+    """
+    if _source_cache is None:
+        raise RuntimeError("Source cache is not configured")
+    if _source_cache.contains(image_path, size):
+        return False
+    _source_cache.put(image_path, size, prepare_source_image(image_path, size, _resample, _jpeg_draft))
+    return True
@@ -0,0 +1,343 @@
+"""
+Caption text layout: font size fitting and line wrapping
+"""
+
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from .config import (
+    DEFAULT_IMAGE_SIZE,
+    FALLBACK_FONT_SIZE,
+    FONT_SIZE_RATIO,
+    FONT_VARIATION,
+    LAYOUT_CACHE_SIZE,
+    LINE_SPACING_RATIO,
+    MAX_TEXT_WIDTH_RATIO,
+    PADDING_SCALING_FACTOR,
+)
+from .fonts import font_fingerprint, get_font
+
+# Bump when the layout algorithm changes so stale on-disk layouts are ignored
+LAYOUT_VERSION = 1
+
+
+@dataclass
+class CaptionLayout:
+    """Wrapped caption and the metrics needed to draw it above an image."""
+
+    font: Any = field(repr=False, compare=False)
+    font_size: int
+    lines: List[str]
+    line_height: int
+    line_spacing: int
+    text_block_height: int
+    bar_height: float
+    fits: bool = True
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize the layout without the font object."""
+        data = asdict(self)
+        del data["font"]
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CaptionLayout":
+        """Rebuild a layout, loading its font from the font cache."""
+        return cls(font=get_font(data["font_size"]), **data)
+
+
+def measure_words(words: List[str], font) -> Dict[str, float]:
+    """
+    Measure the advance width of each distinct word once.
+
+    Args:
+        words: Words of the caption
+        font: Font to measure with
+
+    Returns:
+        Dictionary mapping each word to its width in pixels
+    """
+    return {word: font.getlength(word) for word in set(words)}
+
+
+def wrap_words(words: List[str], widths: Dict[str, float], space_width: float, max_width: float) -> List[str]:
+    """
+    Greedily wrap words into lines using cumulative word widths.
+
+    Args:
+        words: Words of the caption
+        widths: Width of each word in pixels
+        space_width: Width of a single space in pixels
+        max_width: Maximum line width in pixels
+
+    Returns:
+        List of wrapped lines
+    """
+    lines = []
+    current_words: List[str] = []
+    current_width = 0.0
+
+    for word in words:
+        word_width = widths[word]
+        if not current_words:
+            current_words = [word]
+            current_width = word_width
+            continue
+
+        line_width = current_width + space_width + word_width
+        if line_width <= max_width:
+            current_words.append(word)
+            current_width = line_width
+        else:
+            lines.append(" ".join(current_words))
+            current_words = [word]
+            current_width = word_width
+
+    if current_words:
+        lines.append(" ".join(current_words))
+
+    return lines
+
+
+def build_layout(font, font_size: int, lines: List[str], fits: bool = True) -> CaptionLayout:
+    """
+    Compute the caption bar metrics for wrapped lines.
+
+    Args:
+        font: Font the lines will be drawn with
+        font_size: Size of the font in points
+        lines: Wrapped caption lines
+        fits: Whether the caption fit within the maximum text width
+
+    Returns:
+        CaptionLayout ready to be drawn
+    """
+    # bbox of a string with ascenders and descenders to determine line height
+    line_bbox = font.getbbox("gh")
+    line_height = line_bbox[3] - line_bbox[1]
+    line_spacing = int(line_height * LINE_SPACING_RATIO)
+
+    text_block_height = (len(lines) * line_height) + (
+        max(0, len(lines) - 1) * line_spacing
+    )
+
+    padding = int(line_height * PADDING_SCALING_FACTOR)
+    bar_height = text_block_height + (1.65 * padding)
+
+    return CaptionLayout(
+        font=font,
+        font_size=font_size,
+        lines=lines,
+        line_height=line_height,
+        line_spacing=line_spacing,
+        text_block_height=text_block_height,
+        bar_height=bar_height,
+        fits=fits,
+    )
+
+
+def fit_caption(caption_text: str, image_width: int = DEFAULT_IMAGE_SIZE[0]) -> CaptionLayout:
+    """
+    Find the largest font size at which the caption wraps within the image.
+
+    A size fits when every word is narrower than the maximum text width, so
+    the largest fitting size is found by binary search instead of stepping
+    down one size at a time.
+
+    Args:
+        caption_text: Caption to lay out
+        image_width: Width of the image the caption is drawn on
+
+    Returns:
+        CaptionLayout for the largest fitting size, or a single-line layout at
+        the fallback size with fits=False if no size fits
+    """
+    words = caption_text.split(" ")
+    max_text_width = int(image_width * MAX_TEXT_WIDTH_RATIO)
+
+    best = None
+    low, high = 1, int(image_width / FONT_SIZE_RATIO)
+    while low <= high:
+        size = (low + high) // 2
+        font = get_font(size)
+        widths = measure_words(words, font)
+        if max(widths.values()) <= max_text_width:
+            best = (size, font, widths)
+            low = size + 1
+        else:
+            high = size - 1
+
+    if best is None:
+        font = get_font(FALLBACK_FONT_SIZE)
+        return build_layout(font, FALLBACK_FONT_SIZE, [caption_text], fits=False)
+
+    size, font, widths = best
+    lines = wrap_words(words, widths, font.getlength(" "), max_text_width)
+    return build_layout(font, size, lines)
+
+
+class LayoutCache:
+    """In-memory LRU of caption layouts with an optional on-disk store."""
+
+    def __init__(self, max_entries: int = LAYOUT_CACHE_SIZE, directory: Optional[str] = None):
+        self.max_entries = max_entries
+        self.directory = Path(directory) if directory else None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[tuple, CaptionLayout]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def disk_key(self, caption_text: str, image_width: int) -> str:
+        """
+        Build the on-disk key for a caption.
+
+        The key covers everything the layout depends on: the caption, the font
+        file content and the layout config constants.
+        """
+        material = json.dumps(
+            {
+                "caption": caption_text,
+                "image_width": image_width,
+                "font": font_fingerprint(),
+                "variation": FONT_VARIATION,
+                "font_size_ratio": FONT_SIZE_RATIO,
+                "max_text_width_ratio": MAX_TEXT_WIDTH_RATIO,
+                "line_spacing_ratio": LINE_SPACING_RATIO,
+                "padding_scaling_factor": PADDING_SCALING_FACTOR,
+                "fallback_font_size": FALLBACK_FONT_SIZE,
+                "version": LAYOUT_VERSION,
+            },
+            sort_keys=True,
+        )
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _disk_path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"  # type: ignore
+
+    def _load_from_disk(self, key: str) -> Optional[CaptionLayout]:
+        try:
+            with open(self._disk_path(key), "r", encoding="utf-8") as f:
+                return CaptionLayout.from_dict(json.load(f))
+        except (OSError, ValueError, TypeError, KeyError):
+            return None
+
+    def _save_to_disk(self, key: str, layout: CaptionLayout) -> None:
+        path = self._disk_path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Write atomically so concurrent workers never read a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(layout.to_dict(), f)
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
+
+    def get(self, caption_text: str, image_width: int = DEFAULT_IMAGE_SIZE[0]) -> CaptionLayout:
+        """
+        Get the layout for a caption, computing and caching it on a miss.
+
+        Args:
+            caption_text: Caption to lay out
+            image_width: Width of the image the caption is drawn on
+
+        Returns:
+            CaptionLayout for the caption
+        """
+        memory_key = (caption_text, image_width)
+        with self._lock:
+            layout = self._entries.get(memory_key)
+            if layout is not None:
+                self._entries.move_to_end(memory_key)
+                self.hits += 1
+                return layout
+
+        layout = None
+        disk_key = None
+        if self.directory:
+            disk_key = self.disk_key(caption_text, image_width)
+            layout = self._load_from_disk(disk_key)
+
+        from_disk = layout is not None
+        if not from_disk:
+            layout = fit_caption(caption_text, image_width)
+            if disk_key:
+                self._save_to_disk(disk_key, layout)
+
+        with self._lock:
+            if from_disk:
+                self.disk_hits += 1
+            else:
+                self.misses += 1
+            self._entries[memory_key] = layout
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return layout
+
+    def clear(self) -> None:
+        """Drop every in-memory layout; the on-disk store is kept."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Get hit/miss counters for this cache."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+            }
+
+
+_layout_cache = LayoutCache()
+
+
+def configure_layout_cache(directory: Optional[str] = None, max_entries: int = LAYOUT_CACHE_SIZE) -> LayoutCache:
+    """
+    Replace the process-wide layout cache.
+
+    Args:
+        directory: Directory for the on-disk store (None keeps layouts in memory only)
+        max_entries: Maximum number of layouts kept in memory
+
+    Returns:
+        The new layout cache
+    """
+    global _layout_cache
+    current = _layout_cache
+    if current.max_entries == max_entries and current.directory == (Path(directory) if directory else None):
+        return current
+    _layout_cache = LayoutCache(max_entries, directory)
+    return _layout_cache
+
+
+def get_caption_layout(caption_text: str, image_width: int = DEFAULT_IMAGE_SIZE[0]) -> CaptionLayout:
+    """
+    Get a caption layout through the process-wide layout cache.
+
+    Args:
+        caption_text: Caption to lay out
+        image_width: Width of the image the caption is drawn on
+
+    Returns:
+        CaptionLayout for the caption
+    """
+    return _layout_cache.get(caption_text, image_width)
+
+
+def clear_layout_cache() -> None:
+    """Drop the in-memory layouts of the process-wide layout cache."""
+    _layout_cache.clear()
+
+
+def layout_cache_info() -> Dict[str, int]:
+    """Get hit/miss counters for the process-wide layout cache."""
+    return _layout_cache.stats()
@@ -0,0 +1,193 @@
+"""
+Shared HTTP client for the TikTok API
+
+Keeps TLS connections alive across calls, bounds every request with
+connect/read timeouts, retries transient failures with jittered exponential
+backoff and records per-endpoint latency.
+"""
+
+import time
+import random
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from . import metrics
+from .config import (
+    TIKTOK_BACKOFF_BASE,
+    TIKTOK_BACKOFF_MAX,
+    TIKTOK_CONNECT_TIMEOUT,
+    TIKTOK_MAX_RETRIES,
+    TIKTOK_READ_TIMEOUT,
+)
+from .utils.logger import logger
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def error_code(response: requests.Response) -> str:
+    """
+    Get the TikTok error code from a response body.
+
+    Args:
+        response: Response from the TikTok API
+
+    Returns:
+        The body's error.code ("ok" on success), or the OAuth "error" field,
+        or an empty string if the body has neither
+    """
+    try:
+        body = response.json()
+    except ValueError:
+        return ""
+    if not isinstance(body, dict):
+        return ""
+    error = body.get("error")
+    if isinstance(error, dict):
+        return str(error.get("code", ""))
+    # The OAuth token endpoint reports errors as a top-level string
+    return str(error or "")
+
+
+class TikTokAPIClient:
+    """Keep-alive session with timeouts, retries and latency metrics"""
+
+    def __init__(
+        self,
+        connect_timeout: float = TIKTOK_CONNECT_TIMEOUT,
+        read_timeout: float = TIKTOK_READ_TIMEOUT,
+        max_retries: int = TIKTOK_MAX_RETRIES,
+        backoff_base: float = TIKTOK_BACKOFF_BASE,
+        backoff_max: float = TIKTOK_BACKOFF_MAX,
+        pool_size: int = 10,
+    ):
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._latencies: Dict[str, List[float]] = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def _backoff(self, attempt: int, response: Optional[requests.Response] = None) -> float:
+        """Delay before the next attempt, honoring Retry-After when sent"""
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after:
+                try:
+                    return min(float(retry_after), self.backoff_max)
+                except ValueError:
+                    pass
+        # Full jitter spreads out retries from concurrent callers
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _record(self, endpoint: str, elapsed: float, response: Optional[requests.Response] = None, error: Optional[Exception] = None) -> None:
+        with self._lock:
+            self._latencies[endpoint].append(elapsed)
+        metrics.tiktok_seconds.observe(elapsed, endpoint=endpoint)
+        if response is not None:
+            status, code = str(response.status_code), error_code(response)
+        else:
+            status, code = error.__class__.__name__, ""
+        metrics.tiktok_responses.inc(endpoint=endpoint, status=status, code=code)
+
+    def request(self, method: str, url: str, idempotent: bool = True, **kwargs) -> requests.Response:
+        """
+        Send a request, retrying transient failures.
+
+        Args:
+            method: HTTP method
+            url: Request URL
+            idempotent: Whether the request is safe to resend after the server
+                may have processed it. Non-idempotent requests are only retried
+                when rate limited or when the connection could not be opened.
+            **kwargs: Passed through to requests
+
+        Returns:
+            The final response (callers check the status code)
+        """
+        endpoint = urlparse(url).path
+        kwargs.setdefault("timeout", self.timeout)
+
+        attempt = 0
+        while True:
+            start_time = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self._record(endpoint, time.perf_counter() - start_time, error=e)
+                # A connect timeout means the request never reached the server
+                retryable = idempotent or isinstance(e, requests.ConnectTimeout)
+                if not retryable or attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning(f"{method} {endpoint} failed ({e.__class__.__name__}), retrying in {delay:.1f}s")
+            else:
+                self._record(endpoint, time.perf_counter() - start_time, response)
+                retryable = response.status_code == 429 or (
+                    idempotent and response.status_code in RETRY_STATUS_CODES
+                )
+                if not retryable or attempt >= self.max_retries:
+                    return response
+                delay = self._backoff(attempt, response)
+                logger.warning(f"{method} {endpoint} returned {response.status_code}, retrying in {delay:.1f}s")
+
+            time.sleep(delay)
+            attempt += 1
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """Send a GET request"""
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        """Send a POST request"""
+        return self.request("POST", url, **kwargs)
+
+    def latency_stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Summarize request latency per endpoint.
+
+        Returns:
+            Dictionary mapping endpoint paths to count, mean, p50, p95 and max in seconds
+        """
+        stats = {}
+        with self._lock:
+            for endpoint, samples in self._latencies.items():
+                ordered = sorted(samples)
+                stats[endpoint] = {
+                    "count": len(ordered),
+                    "mean": sum(ordered) / len(ordered),
+                    "p50": ordered[len(ordered) // 2],
+                    "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+                    "max": ordered[-1],
+                }
+        return stats
+
+    def log_latency_stats(self) -> None:
+        """Log the latency summary for every endpoint called so far"""
+        for endpoint, stat in sorted(self.latency_stats().items()):
+            logger.info(
+                f"{stat['count']} calls, mean {stat['mean'] * 1000:.0f}ms, "
+                f"p95 {stat['p95'] * 1000:.0f}ms",
+                prefix=endpoint,
+            )
+
+
+_api_client: Optional[TikTokAPIClient] = None
+_api_client_lock = threading.Lock()
+
+
+def get_api_client() -> TikTokAPIClient:
+    """Get the process-wide TikTok API client"""
+    global _api_client
+    with _api_client_lock:
+        if _api_client is None:
+            _api_client = TikTokAPIClient()
+        return _api_client
@@ -0,0 +1,106 @@
+"""
+Encrypted on-disk store for TikTok OAuth tokens
+"""
+
+import os
+import json
+import time
+import base64
+import tempfile
+import hashlib
+from pathlib import Path
+from typing import Any, Dict, Optional
+from cryptography.fernet import Fernet, InvalidToken
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from .config import TOKEN_EXPIRY_MARGIN, TOKEN_STORE_DIR
+
+
+class TokenStore:
+    """
+    Access and refresh tokens for one TikTok client, encrypted at rest.
+
+    The encryption key is derived from the client secret, so tokens can only
+    be read back by a process that already holds the app credentials.
+    """
+
+    def __init__(self, client_id: str, client_secret: str, directory: Path = TOKEN_STORE_DIR):
+        self.client_id = client_id
+        name = hashlib.sha256(client_id.encode("utf-8")).hexdigest()[:16]
+        self.path = Path(directory) / f"{name}.token"
+
+        key = HKDF(
+            algorithm=hashes.SHA256(),
+            length=32,
+            salt=client_id.encode("utf-8"),
+            info=b"levibes-tiktok-token-store",
+        ).derive(client_secret.encode("utf-8"))
+        self._fernet = Fernet(base64.urlsafe_b64encode(key))
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        """
+        Load the stored token.
+
+        Returns:
+            Token dictionary, or None if missing or unreadable
+        """
+        try:
+            encrypted = self.path.read_bytes()
+            return json.loads(self._fernet.decrypt(encrypted))
+        except (OSError, InvalidToken, ValueError):
+            return None
+
+    def save(self, token: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Store a token response from the TikTok token endpoint.
+
+        Relative lifetimes (expires_in, refresh_expires_in) are converted to
+        absolute timestamps so they can be checked on later runs.
+
+        Args:
+            token: Token endpoint response
+
+        Returns:
+            The stored token dictionary
+        """
+        now = time.time()
+        stored = dict(token)
+        if "expires_in" in token:
+            stored["expires_at"] = now + int(token["expires_in"])
+        if "refresh_expires_in" in token:
+            stored["refresh_expires_at"] = now + int(token["refresh_expires_in"])
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # mkstemp creates the file owner-only, and replacing the old file means
+        # its permissions never carry over; readers never see a partial token
+        fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(self._fernet.encrypt(json.dumps(stored).encode("utf-8")))
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return stored
+
+    def clear(self) -> None:
+        """Delete the stored token."""
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def is_access_token_valid(token: Optional[Dict[str, Any]], margin: int = TOKEN_EXPIRY_MARGIN) -> bool:
+    """Check whether a stored token has an access token that won't expire soon."""
+    if not token or not token.get("access_token"):
+        return False
+    return token.get("expires_at", 0) - margin > time.time()
+
+
+def is_refresh_token_valid(token: Optional[Dict[str, Any]], margin: int = TOKEN_EXPIRY_MARGIN) -> bool:
+    """Check whether a stored token has a refresh token that won't expire soon."""
+    if not token or not token.get("refresh_token"):
+        return False
+    # Tokens stored without a refresh expiry are assumed refreshable
+    return token.get("refresh_expires_at", float("inf")) - margin > time.time()
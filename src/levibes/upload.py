@@ -5,6 +5,7 @@ Handles uploading images to Cloudflare R2 and posting to TikTok via Content Post
 """
 
 import os
+import io
 import base64
 import json
 import secrets
@@ -15,11 +16,12 @@ import hashlib
 import ssl
 import ipaddress
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, Dict, Any, List, Tuple
-from urllib.parse import urlencode, parse_qs
-import requests
+from typing import Optional, Dict, Any, List, Tuple, BinaryIO, Union
+from urllib.parse import urlencode, urlparse, parse_qs
 from flask import Flask, request, jsonify
+from werkzeug.serving import make_server
 from PIL import Image
 import gratient
 from cryptography import x509
@@ -30,22 +32,89 @@ from cryptography.hazmat.primitives import serialization
 import datetime
 import boto3
 from botocore.client import Config
+from botocore.exceptions import ClientError
+from . import metrics
+from .config import R2_HEAD_CHECK, R2_MANIFEST_DIR, R2_MAX_POOL_CONNECTIONS, R2_UPLOAD_CONCURRENCY
+from .encoding import EncoderOptions, content_type_for_path, encode_image
+from .publish_status import wait_for_publish
+from .tiktok_api import get_api_client
+from .token_store import TokenStore, is_access_token_valid, is_refresh_token_valid
 from .utils.logger import logger
+from .utils.timing import span
 
 # Configure Flask logging to only show errors
 logging.getLogger('werkzeug').setLevel(logging.ERROR)
 logging.getLogger('flask').setLevel(logging.ERROR)
 
 
+TIKTOK_TOKEN_URL = "https://open.tiktokapis.com/v2/oauth/token/"
+
+
 class TikTokUploadError(Exception):
     """Custom exception for TikTok upload errors"""
     pass
 
 
+# boto3 clients are thread-safe, so one client (and its connection pool) is
+# shared by every uploader with the same credentials
+_r2_clients: Dict[Tuple[str, str, str, int], Any] = {}
+_r2_clients_lock = threading.Lock()
+
+
+def get_r2_client(endpoint_url: str, access_key_id: str, secret_access_key: str, max_pool_connections: int = R2_MAX_POOL_CONNECTIONS):
+    """Get a shared R2 client with a connection pool sized for concurrent uploads"""
+    key = (endpoint_url, access_key_id, secret_access_key, max_pool_connections)
+    with _r2_clients_lock:
+        client = _r2_clients.get(key)
+        if client is None:
+            client = boto3.client(
+                's3',
+                endpoint_url=endpoint_url,
+                aws_access_key_id=access_key_id,
+                aws_secret_access_key=secret_access_key,
+                config=Config(
+                    signature_version='s3v4',
+                    max_pool_connections=max_pool_connections,
+                )
+            )
+            _r2_clients[key] = client
+        return client
+
+
+class UploadManifest:
+    """Local record of object keys already uploaded to a bucket"""
+    
+    def __init__(self, path: Optional[Path] = None):
+        self.path = path
+        self._keys = set()
+        self._lock = threading.Lock()
+        
+        if path and path.exists():
+            with open(path, 'r', encoding='utf-8') as f:
+                self._keys = {line.strip() for line in f if line.strip()}
+    
+    def __contains__(self, object_key: str) -> bool:
+        return object_key in self._keys
+    
+    def add(self, object_key: str) -> None:
+        """Record an uploaded object key"""
+        with self._lock:
+            if object_key in self._keys:
+                return
+            self._keys.add(object_key)
+            if self.path:
+                try:
+                    self.path.parent.mkdir(parents=True, exist_ok=True)
+                    with open(self.path, 'a', encoding='utf-8') as f:
+                        f.write(object_key + '\n')
+                except OSError as e:
+                    logger.warning(f"Could not update upload manifest: {e}")
+
+
 class CloudflareR2Uploader:
     """Cloudflare R2 storage handler"""
     
-    def __init__(self):
+    def __init__(self, max_pool_connections: int = R2_MAX_POOL_CONNECTIONS, head_check: bool = R2_HEAD_CHECK, use_manifest: bool = True):
         self.endpoint_url = os.environ.get('CLOUDFLARE_R2_ENDPOINT_URL')
         self.access_key_id = os.environ.get('CLOUDFLARE_R2_ACCESS_KEY_ID')
         self.secret_access_key = os.environ.get('CLOUDFLARE_R2_SECRET_ACCESS_KEY')
@@ -55,48 +124,113 @@ class CloudflareR2Uploader:
         if not all([self.endpoint_url, self.access_key_id, self.secret_access_key, self.bucket_name]):
             raise TikTokUploadError("Missing required Cloudflare R2 environment variables")
         
-        # Initialize R2 client - variables guaranteed to be non-None after validation above
-        self.client = boto3.client(  # type: ignore
-            's3',
-            endpoint_url=self.endpoint_url,  # type: ignore
-            aws_access_key_id=self.access_key_id,  # type: ignore
-            aws_secret_access_key=self.secret_access_key,  # type: ignore
-            config=Config(signature_version='s3v4')
+        # Shared R2 client - variables guaranteed to be non-None after validation above
+        self.client = get_r2_client(
+            self.endpoint_url,  # type: ignore
+            self.access_key_id,  # type: ignore
+            self.secret_access_key,  # type: ignore
+            max_pool_connections,
         )
+        
+        # Content-addressed keys already known to be in the bucket. Keyed by
+        # endpoint too, so buckets with the same name in other accounts don't share it
+        self.head_check = head_check
+        self.manifest = UploadManifest(
+            R2_MANIFEST_DIR / f"{urlparse(self.endpoint_url).hostname}_{self.bucket_name}.txt" if use_manifest else None
+        )
+        # Manifest entries confirmed to still be in the bucket during this run
+        self._verified = set()
+        self._verified_lock = threading.Lock()
     
     def upload_image(self, image_path: str, object_key: Optional[str] = None) -> str:
         """Upload image to Cloudflare R2 and return public URL"""
-        if not object_key:
-            # Generate unique object key
-            timestamp = int(time.time())
-            filename = Path(image_path).name
-            object_key = f"levibes/{timestamp}_{filename}"
-        
+        with open(image_path, 'rb') as file:
+            return self.upload_fileobj(
+                file, Path(image_path).name, content_type_for_path(image_path), object_key
+            )
+    
+    def public_url(self, object_key: str) -> str:
+        """Get the public URL of an object"""
+        if self.public_url_base:
+            # Use provided public URL base (r2.dev subdomain or custom domain)
+            return f"{self.public_url_base.rstrip('/')}/{object_key}"
+        # Fallback: construct URL using bucket name with endpoint
+        # This assumes the bucket has public access enabled
+        endpoint_with_bucket = self.endpoint_url.replace('https://', f'https://{self.bucket_name}.')  # type: ignore
+        return f"{endpoint_with_bucket}/{object_key}"
+    
+    def object_exists(self, object_key: str) -> bool:
+        """Check whether an object already exists in the bucket"""
+        try:
+            self.client.head_object(Bucket=self.bucket_name, Key=object_key)
+            return True
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+    
+    def still_in_bucket(self, object_key: str) -> bool:
+        """Check a manifest entry against the bucket, once per key per run"""
+        with self._verified_lock:
+            if object_key in self._verified:
+                return True
+        if not self.object_exists(object_key):
+            logger.warning(f"{object_key} is in the upload manifest but not in the bucket, uploading it again", prefix="R2")
+            return False
+        with self._verified_lock:
+            self._verified.add(object_key)
+        return True
+    
+    def upload_fileobj(self, fileobj: BinaryIO, filename: str, content_type: str = 'image/jpeg', object_key: Optional[str] = None) -> str:
+        """
+        Upload an encoded image from a file object to Cloudflare R2 and return public URL.
+        
+        Without an explicit object key, the key is the SHA-256 of the content, so
+        identical bytes map to the same object and are only uploaded once.
+        """
+        start_time = time.perf_counter()
         try:
+            if not object_key:
+                data = fileobj.read()
+                digest = hashlib.sha256(data).hexdigest()
+                object_key = f"levibes/{digest}{Path(filename).suffix.lower()}"
+                fileobj = io.BytesIO(data)
+                
+                if object_key in self.manifest and (not self.head_check or self.still_in_bucket(object_key)):
+                    logger.info(f"Skipped {filename} (already uploaded)", prefix="R2")
+                    return self.public_url(object_key)
+                
+                if self.head_check and self.object_exists(object_key):
+                    self.manifest.add(object_key)
+                    logger.info(f"Skipped {filename} (already in bucket)", prefix="R2")
+                    return self.public_url(object_key)
+            
             # Upload file to R2
-            with open(image_path, 'rb') as file:
+            position = fileobj.tell()
+            size = fileobj.seek(0, io.SEEK_END) - position
+            fileobj.seek(position)
+            upload_start = time.perf_counter()
+            with span("r2.upload"):
                 self.client.upload_fileobj(
-                    file,
+                    fileobj,
                     self.bucket_name,
                     object_key,
                     ExtraArgs={
-                        'ContentType': 'image/jpeg',
+                        'ContentType': content_type,
                         'ACL': 'public-read'
                     }
                 )
+            metrics.r2_seconds.observe(time.perf_counter() - upload_start)
+            metrics.r2_bytes.inc(size)
+            self.manifest.add(object_key)
+            with self._verified_lock:
+                self._verified.add(object_key)
+            logger.info(f"Uploaded {filename} in {time.perf_counter() - start_time:.2f}s", prefix="R2")
             
-            # Return public URL
-            if self.public_url_base:
-                # Use provided public URL base (r2.dev subdomain or custom domain)
-                return f"{self.public_url_base.rstrip('/')}/{object_key}"
-            else:
-                # Fallback: construct URL using bucket name with endpoint
-                # This assumes the bucket has public access enabled
-                endpoint_with_bucket = self.endpoint_url.replace('https://', f'https://{self.bucket_name}.')  # type: ignore
-                return f"{endpoint_with_bucket}/{object_key}"
+            return self.public_url(object_key)
                 
         except Exception as e:
-            raise TikTokUploadError(f"Failed to upload {image_path} to R2: {str(e)}")
+            raise TikTokUploadError(f"Failed to upload {filename} to R2: {str(e)}")
 
 
 class TikTokOAuthServer:
@@ -115,6 +249,10 @@ class TikTokOAuthServer:
         ).decode().rstrip('=')
         self.authorization_code = None
         self.access_token = None
+        self.token: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        # Set by the callback once the flow has finished, successfully or not
+        self.completed = threading.Event()
         
         # Configure Flask app with minimal logging
         self.app = Flask(__name__)
@@ -137,7 +275,9 @@ class TikTokOAuthServer:
             error = request.args.get('error')
             
             if error:
-                return jsonify({'error': f'Authorization failed: {error}'}), 400
+                self.error = f"Authorization failed: {error}"
+                self.completed.set()
+                return jsonify({'error': self.error}), 400
             
             if state != self.state:
                 return jsonify({'error': 'Invalid state parameter'}), 400
@@ -149,7 +289,9 @@ class TikTokOAuthServer:
             
             # Exchange code for access token
             try:
-                self.access_token = self.exchange_code_for_token(code)
+                self.token = self.exchange_code_for_token(code)
+                self.access_token = self.token["access_token"]
+                self.completed.set()
                 return '''
                 <html>
                 <body>
@@ -160,7 +302,9 @@ class TikTokOAuthServer:
                 </html>
                 '''
             except Exception as e:
-                return jsonify({'error': f'Token exchange failed: {str(e)}'}), 500
+                self.error = f"Token exchange failed: {str(e)}"
+                self.completed.set()
+                return jsonify({'error': self.error}), 500
     
     def is_cert_valid(self) -> bool:
         """Check if existing certificate is still valid"""
@@ -231,10 +375,8 @@ class TikTokOAuthServer:
         with open(self.cert_path, "wb") as f:
             f.write(cert.public_bytes(serialization.Encoding.PEM))
     
-    def exchange_code_for_token(self, code: str) -> str:
-        """Exchange authorization code for access token"""
-        token_url = "https://open.tiktokapis.com/v2/oauth/token/"
-        
+    def exchange_code_for_token(self, code: str) -> Dict[str, Any]:
+        """Exchange authorization code for access and refresh tokens"""
         data = {
             "client_key": self.client_id,  # TikTok now uses client_key instead of client_id
             "client_secret": self.client_secret,
@@ -244,14 +386,14 @@ class TikTokOAuthServer:
             "code_verifier": self.code_verifier,
         }
         
-        response = requests.post(token_url, data=data, headers={
+        response = get_api_client().post(TIKTOK_TOKEN_URL, idempotent=False, data=data, headers={
             "Content-Type": "application/x-www-form-urlencoded"
         })
         
-        if response.status_code != 200:
+        if response.status_code != 200 or "access_token" not in response.json():
             raise Exception(f"Token exchange failed: {response.text}")
         
-        return response.json()["access_token"]
+        return response.json()
     
     def get_auth_url(self) -> str:
         """Get the authorization URL"""
@@ -275,39 +417,43 @@ class TikTokOAuthServer:
             logger.progress("Generating SSL certificate")
             self.generate_self_signed_cert()
         
-        # Start Flask server in a separate thread
-        def run_server():
-            try:
-                # Use threaded=True and disable request logging
-                self.app.run(
-                    host='0.0.0.0',
-                    port=self.port,
-                    ssl_context=(str(self.cert_path), str(self.key_path)),
-                    threaded=True,
-                    use_reloader=False,
-                    debug=False
-                )
-            except Exception as e:
-                logger.error(f"Flask server error: {e}")
-        
-        server_thread = threading.Thread(target=run_server, daemon=True)
+        # Bind the socket before opening the browser so the callback can't race the server
+        try:
+            server = make_server(
+                '0.0.0.0',
+                self.port,
+                self.app,
+                threaded=True,
+                ssl_context=(str(self.cert_path), str(self.key_path)),
+            )
+        except OSError as e:
+            raise TikTokUploadError(f"Could not start OAuth callback server on port {self.port}: {e}")
+        
+        # A short poll interval lets shutdown() return promptly after the callback
+        server_thread = threading.Thread(
+            target=server.serve_forever,
+            kwargs={"poll_interval": 0.05},
+            name="levibes-oauth",
+            daemon=True,
+        )
         server_thread.start()
         
-        # Give server time to start
-        time.sleep(2)
-        
-        # Open browser for authentication
-        auth_url = self.get_auth_url()
-        logger.progress("Opening browser for TikTok authentication")
-        webbrowser.open(auth_url)
-        
-        # Wait for callback
-        start_time = time.time()
-        while self.access_token is None and time.time() - start_time < timeout:
-            time.sleep(1)
+        try:
+            # Open browser for authentication
+            auth_url = self.get_auth_url()
+            logger.progress("Opening browser for TikTok authentication")
+            webbrowser.open(auth_url)
+            
+            # Wake up as soon as the callback has exchanged the code
+            if not self.completed.wait(timeout):
+                raise TikTokUploadError("Authentication timed out")
+        finally:
+            server.shutdown()
+            server_thread.join()
+            server.server_close()
         
-        if self.access_token is None:
-            raise TikTokUploadError("Authentication timed out")
+        if self.error or self.access_token is None:
+            raise TikTokUploadError(self.error or "Authentication failed")
         
         logger.success("TikTok authentication successful")
         return self.access_token
@@ -322,44 +468,74 @@ class TikTokOAuthServer:
 class TikTokUploader:
     """Main TikTok uploader class"""
     
-    def __init__(self, client_id: str, client_secret: str):
+    def __init__(self, client_id: str, client_secret: str, upload_concurrency: int = R2_UPLOAD_CONCURRENCY, token_store: Optional[TokenStore] = None, verify_uploads: bool = R2_HEAD_CHECK):
         self.client_id = client_id
         self.client_secret = client_secret
         self.access_token = None
-        self.r2_uploader = CloudflareR2Uploader()
+        self.token_store = token_store or TokenStore(client_id, client_secret)
+        self.upload_concurrency = upload_concurrency
+        self.r2_uploader = CloudflareR2Uploader(max(upload_concurrency, R2_MAX_POOL_CONNECTIONS), head_check=verify_uploads)
     
-    def authenticate(self) -> str:
-        """Authenticate with TikTok and return access token"""
-        oauth_server = TikTokOAuthServer(self.client_id, self.client_secret)
-        self.access_token = oauth_server.start_auth_flow()
-        oauth_server.cleanup()
-        return self.access_token
+    def authenticate(self, interactive: bool = True) -> str:
+        """
+        Authenticate with TikTok and return access token.
+        
+        Uses the stored token when it is still valid, refreshes it silently
+        when it has expired, and only opens the browser flow when neither works.
+        
+        Args:
+            interactive: Whether the browser flow may be used; without it,
+                TikTokUploadError is raised when the stored token can't be used
+        """
+        with span("auth", profile=True):
+            token = self.token_store.load() if self.token_store else None
+            
+            if is_access_token_valid(token):
+                logger.success("Using stored TikTok access token")
+            elif is_refresh_token_valid(token):
+                try:
+                    token = self.refresh_token(token["refresh_token"])  # type: ignore
+                    logger.success("Refreshed TikTok access token")
+                except Exception as e:
+                    logger.warning(f"Token refresh failed: {e}")
+                    token = None
+            else:
+                token = None
+            
+            if token is None and not interactive:
+                raise TikTokUploadError("TikTok login has expired; re-run `levibes` interactively to authenticate")
+            
+            if token is None:
+                oauth_server = TikTokOAuthServer(self.client_id, self.client_secret)
+                oauth_server.start_auth_flow()
+                oauth_server.cleanup()
+                token = oauth_server.token
+                if self.token_store and token:
+                    token = self.token_store.save(token)
+            
+            self.access_token = token["access_token"]  # type: ignore
+        return self.access_token  # type: ignore
     
-    def convert_png_to_jpeg(self, image_path: str) -> str:
-        """Convert PNG to JPEG if needed"""
-        if not image_path.lower().endswith('.png'):
-            return image_path
+    def refresh_token(self, refresh_token: str) -> Dict[str, Any]:
+        """Exchange a refresh token for a new access token and store it"""
+        data = {
+            "client_key": self.client_id,
+            "client_secret": self.client_secret,
+            "grant_type": "refresh_token",
+            "refresh_token": refresh_token,
+        }
+        
+        response = get_api_client().post(TIKTOK_TOKEN_URL, idempotent=False, data=data, headers={
+            "Content-Type": "application/x-www-form-urlencoded"
+        })
         
-        jpeg_path = image_path.rsplit('.', 1)[0] + '.jpg'
+        if response.status_code != 200 or "access_token" not in response.json():
+            raise TikTokUploadError(f"Token refresh failed: {response.text}")
         
-        try:
-            with Image.open(image_path) as img:
-                # Convert RGBA to RGB if needed
-                if img.mode in ("RGBA", "LA", "P"):
-                    # Create white background
-                    background = Image.new("RGB", img.size, (255, 255, 255))
-                    if img.mode == "P":
-                        img = img.convert("RGBA")
-                    background.paste(img, mask=img.split()[-1] if img.mode == "RGBA" else None)
-                    img = background
-                
-                # Save as JPEG
-                img.save(jpeg_path, "JPEG", quality=95)
-            
-            return jpeg_path
-        except Exception as e:
-            logger.error(f"Failed to convert PNG to JPEG: {e}")
-            return image_path
+        token = response.json()
+        if self.token_store:
+            token = self.token_store.save(token)
+        return token
     
     def get_user_info(self) -> Dict[str, Any]:
         """Get user information from TikTok"""
@@ -372,7 +548,7 @@ class TikTokUploader:
             "Content-Type": "application/json"
         }
         
-        response = requests.get(url, headers=headers)
+        response = get_api_client().get(url, headers=headers)
         if response.status_code != 200:
             raise TikTokUploadError(f"Failed to get user info: {response.text}")
         
@@ -382,18 +558,15 @@ class TikTokUploader:
         """Upload images to Cloudflare R2"""
         logger.progress("Uploading images to cloud storage")
         
-        urls = []
-        for i, image_path in enumerate(image_paths):
-            # Convert PNG to JPEG if needed
-            converted_path = self.convert_png_to_jpeg(image_path)
-            
-            # Upload to R2
-            url = self.r2_uploader.upload_image(converted_path)
-            urls.append(url)
-            
-            # Clean up converted file if it was created
-            if converted_path != image_path and os.path.exists(converted_path):
-                os.remove(converted_path)
+        def upload(image_path: str) -> str:
+            fileobj, filename, content_type = load_upload_image(image_path)
+            return self.r2_uploader.upload_fileobj(fileobj, filename, content_type)
+        
+        # map() keeps the returned URLs in the same order as image_paths
+        start_time = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.upload_concurrency) as executor:
+            urls = list(executor.map(upload, image_paths))
+        logger.info(f"Uploads took {time.perf_counter() - start_time:.2f}s with concurrency {self.upload_concurrency}", prefix="R2")
         
         logger.success(f"Uploaded {len(urls)} images to cloud storage")
         return urls
@@ -438,7 +611,8 @@ class TikTokUploader:
             "Content-Type": "application/json; charset=UTF-8"
         }
         
-        response = requests.post(url, json=post_data, headers=headers)
+        with span("tiktok.draft"):
+            response = get_api_client().post(url, idempotent=False, json=post_data, headers=headers)
         
         if response.status_code != 200:
             raise TikTokUploadError(f"Failed to create TikTok draft: {response.text}")
@@ -459,7 +633,7 @@ class TikTokUploader:
         }
         
         data = {"publish_id": publish_id}
-        response = requests.post(url, json=data, headers=headers)
+        response = get_api_client().post(url, json=data, headers=headers)
         
         if response.status_code != 200:
             raise TikTokUploadError(f"Failed to get upload status: {response.text}")
@@ -467,6 +641,50 @@ class TikTokUploader:
         return response.json()
 
 
+def convert_png_to_jpeg(image: Union[str, BinaryIO], filename: Optional[str] = None) -> Tuple[BinaryIO, str]:
+    """Encode a PNG (path or file object) as an in-memory JPEG, returning the buffer and its filename"""
+    buffer = io.BytesIO()
+    with Image.open(image) as img:
+        encode_image(img, buffer, EncoderOptions(format="jpeg", quality=95))
+    buffer.seek(0)
+    return buffer, Path(filename or image).stem + '.jpg'  # type: ignore
+
+
+def load_upload_image(image_path: str) -> Tuple[BinaryIO, str, str]:
+    """
+    Open an image for upload, converting PNGs to JPEG in memory.
+    
+    Returns:
+        Tuple of (file object, filename, content type)
+    """
+    if image_path.lower().endswith('.png'):
+        try:
+            buffer, filename = convert_png_to_jpeg(image_path)
+            return buffer, filename, 'image/jpeg'
+        except Exception as e:
+            logger.error(f"Failed to convert PNG to JPEG: {e}")
+    
+    with open(image_path, 'rb') as file:
+        data = file.read()
+    return io.BytesIO(data), Path(image_path).name, content_type_for_path(image_path)
+
+
+def wrap_upload_bytes(data: bytes, filename: str, content_type: str) -> Tuple[BinaryIO, str, str]:
+    """
+    Wrap an in-memory rendered image for upload, converting PNGs to JPEG.
+    
+    TikTok photo posts don't accept PNG, so this matches load_upload_image
+    for images that were never written to disk.
+    
+    Returns:
+        Tuple of (file object, filename, content type)
+    """
+    if content_type == 'image/png':
+        buffer, filename = convert_png_to_jpeg(io.BytesIO(data), filename)
+        return buffer, filename, 'image/jpeg'
+    return io.BytesIO(data), filename, content_type
+
+
 def validate_tiktok_env() -> Tuple[str, str]:
     """Validate TikTok environment variables"""
     client_id = os.environ.get('TIKTOK_CLIENT_ID')
@@ -499,7 +717,7 @@ def get_image_files(output_dir: str, outro_image: str = "outro.png") -> List[str
     
     # Get all generated images
     for file in os.listdir(output_dir):
-        if file.lower().endswith(('.jpg', '.jpeg', '.png')) and file.startswith('captioned_'):
+        if file.lower().endswith(('.jpg', '.jpeg', '.png', '.webp')) and file.startswith('captioned_'):
             image_files.append(os.path.join(output_dir, file))
     
     # Sort by filename for consistent ordering
@@ -517,47 +735,64 @@ def get_image_files(output_dir: str, outro_image: str = "outro.png") -> List[str
     return image_files
 
 
-def upload_to_tiktok(output_dir: str, caption_data=None, outro_image: str = "outro.png") -> bool:
-    """Upload images to TikTok"""
+def caption_title_and_hashtags(caption_data) -> Tuple[str, Optional[List[str]]]:
+    """Split a TikTokCaption or plain string caption into a title and hashtags"""
+    if not caption_data:
+        return "", None
+    if hasattr(caption_data, 'title') and hasattr(caption_data, 'hashtags'):
+        # TikTokCaption object
+        return caption_data.title, caption_data.hashtags
+    # String caption
+    return str(caption_data), None
+
+
+def upload_to_tiktok(output_dir: Optional[str], caption_data=None, outro_image: str = "outro.png", image_urls: Optional[List[str]] = None, upload_concurrency: int = R2_UPLOAD_CONCURRENCY, wait_status: bool = False, verify_uploads: bool = R2_HEAD_CHECK) -> bool:
+    """
+    Upload images to TikTok, reusing already uploaded image URLs if given.
+
+    With wait_status, block until TikTok has finished processing the draft
+    and only report success if it reached the user's inbox.
+    """
     try:
         # Validate environment
         client_id, client_secret = validate_tiktok_env()
         validate_r2_env()
         
-        # Get image files
-        image_files = get_image_files(output_dir, outro_image)
-        logger.info(f"Found {len(image_files)} images to upload")
+        image_files = []
+        if image_urls is None:
+            # Get image files
+            image_files = get_image_files(output_dir, outro_image)  # type: ignore
+            logger.info(f"Found {len(image_files)} images to upload")
         
         # Initialize uploader
-        uploader = TikTokUploader(client_id, client_secret)
+        uploader = TikTokUploader(client_id, client_secret, upload_concurrency, verify_uploads=verify_uploads)
         
         # Authenticate
         logger.progress("Authenticating with TikTok")
         uploader.authenticate()
         
         # Upload images to R2
-        image_urls = uploader.upload_images_to_r2(image_files)
+        if image_urls is None:
+            image_urls = uploader.upload_images_to_r2(image_files)
         
         # Prepare caption data
-        title = ""
-        hashtags = None
-        
-        if caption_data:
-            if hasattr(caption_data, 'title') and hasattr(caption_data, 'hashtags'):
-                # TikTokCaption object
-                title = caption_data.title
-                hashtags = caption_data.hashtags
-            else:
-                # String caption
-                title = str(caption_data)
+        title, hashtags = caption_title_and_hashtags(caption_data)
         
         # Upload to TikTok
         result = uploader.upload_photos_as_draft(image_urls, title, hashtags)
         
         logger.success("Images uploaded to TikTok as draft")
-        logger.info("Check your TikTok app inbox to review and publish")
         
-        return True
+        succeeded = True
+        publish_id = result.get("data", {}).get("publish_id")
+        if wait_status and publish_id:
+            succeeded = all(status.succeeded for status in wait_for_publish(uploader, [publish_id]))
+        
+        if succeeded:
+            logger.info("Check your TikTok app inbox to review and publish")
+        get_api_client().log_latency_stats()
+        
+        return succeeded
         
     except TikTokUploadError as e:
         logger.error(f"TikTok upload failed: {e}")
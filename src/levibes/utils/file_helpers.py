@@ -26,6 +26,35 @@ def get_image_paths(directory: str) -> List[str]:
     ]
 
 
+def read_captions_from_file(file_path, num_images):
+    """
+    Read captions from a text file.
+
+    Args:
+        file_path (str): Path to the text file containing captions
+        num_images (int): Number of captions needed
+
+    Returns:
+        list: List of captions read from the file
+
+    Raises:
+        FileNotFoundError: If the file doesn't exist
+        ValueError: If the file doesn't contain enough captions
+    """
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"Caption file not found: {file_path}")
+
+    with open(file_path, "r", encoding="utf-8") as file:
+        captions = [line.strip() for line in file if line.strip()]
+
+    if len(captions) < num_images:
+        raise ValueError(
+            f"Not enough captions in file. Found {len(captions)}, need {num_images}"
+        )
+
+    return captions[:num_images]
+
+
 def create_unique_output_dir(base_dir: str) -> str:
     """
     Create a unique output directory with UUID.
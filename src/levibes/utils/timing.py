@@ -0,0 +1,212 @@
+"""
+Timing spans and run reports for LeVibes
+
+Named spans record how long each part of a run took. Durations are
+aggregated per span name and, inside post_scope(), per post, then written as
+a JSON run report, along with the counters of any registered caches. Stage
+spans can also be profiled with cProfile, giving one dump per stage.
+"""
+
+import os
+import json
+import time
+import cProfile
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, DefaultDict, Dict, Iterator, List, Optional
+
+_current_post: ContextVar[Optional[str]] = ContextVar("levibes_post", default=None)
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """
+    Summarize span durations.
+
+    Args:
+        samples: Durations in seconds
+
+    Returns:
+        Dictionary with count, total, mean, p50, p95 and max in seconds
+    """
+    ordered = sorted(samples)
+    total = sum(ordered)
+    return {
+        "count": len(ordered),
+        "total": total,
+        "mean": total / len(ordered),
+        "p50": ordered[len(ordered) // 2],
+        "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "max": ordered[-1],
+    }
+
+
+class Timings:
+    """
+    Span durations collected over one run.
+
+    Safe to record into from any thread. Only one stage is profiled at a
+    time; a stage span that starts while another is being profiled is timed
+    but not profiled.
+    """
+
+    def __init__(self):
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self._spans: DefaultDict[str, List[float]] = defaultdict(list)
+        self._posts: DefaultDict[str, DefaultDict[str, float]] = defaultdict(lambda: defaultdict(float))
+        self._lock = threading.Lock()
+        self.profile_dir: Optional[str] = None
+        self._profiles: Dict[str, cProfile.Profile] = {}
+        self._profile_lock = threading.Lock()
+        self._stats: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+    def add_stats(self, name: str, provider: Callable[[], Dict[str, Any]]) -> None:
+        """
+        Include a set of counters in the run report.
+
+        Args:
+            name: Key of the counters under "caches" in the report
+            provider: Called when the report is built to get the counters
+        """
+        self._stats[name] = provider
+
+    def record(self, name: str, seconds: float, post: Optional[str] = None) -> None:
+        """
+        Record one span duration.
+
+        Args:
+            name: Span name
+            seconds: Duration in seconds
+            post: Post to attribute the time to (defaults to the current post_scope)
+        """
+        post = post if post is not None else _current_post.get()
+        with self._lock:
+            self._spans[name].append(seconds)
+            if post is not None:
+                self._posts[post][name] += seconds
+
+    @contextmanager
+    def span(self, name: str, profile: bool = False) -> Iterator[None]:
+        """
+        Time a block of code.
+
+        Args:
+            name: Span name
+            profile: Profile the block when profiling is enabled
+        """
+        profiler = self._start_profile(name) if profile else None
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start_time)
+            if profiler is not None:
+                profiler.disable()
+                self._profile_lock.release()
+
+    def _start_profile(self, name: str) -> Optional[cProfile.Profile]:
+        if self.profile_dir is None or not self._profile_lock.acquire(blocking=False):
+            return None
+        # One profiler per stage accumulates every run of that stage
+        profiler = self._profiles.setdefault(name, cProfile.Profile())
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active, e.g. python -m cProfile
+            self._profile_lock.release()
+            return None
+        return profiler
+
+    def reset(self) -> None:
+        """Discard everything recorded so far and restart the run clock"""
+        with self._lock:
+            self.started_at = time.time()
+            self._start = time.perf_counter()
+            self._spans.clear()
+            self._posts.clear()
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Build the run report.
+
+        Returns:
+            Dictionary with the run's start time and wall time, a summary per
+            span name, the total time per span name for each post and the
+            counters of each registered cache
+        """
+        with self._lock:
+            report = {
+                "started_at": self.started_at,
+                "wall_time": time.perf_counter() - self._start,
+                "spans": {name: summarize(samples) for name, samples in sorted(self._spans.items())},
+                "posts": {post: dict(spans) for post, spans in self._posts.items()},
+            }
+        report["caches"] = {name: provider() for name, provider in self._stats.items()}
+        return report
+
+    def dump_profiles(self) -> Dict[str, str]:
+        """
+        Write one cProfile dump per profiled stage.
+
+        Returns:
+            Dictionary mapping stage names to the dump paths
+        """
+        if self.profile_dir is None:
+            return {}
+        os.makedirs(self.profile_dir, exist_ok=True)
+        paths = {}
+        for name, profiler in self._profiles.items():
+            paths[name] = os.path.join(self.profile_dir, f"{name}.prof")
+            profiler.dump_stats(paths[name])
+        return paths
+
+    def write_report(self, path: str) -> None:
+        """
+        Write the run report as JSON, dumping stage profiles first.
+
+        Args:
+            path: File to write the report to
+        """
+        report = self.report()
+        report["profiles"] = self.dump_profiles()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+# Global timings instance
+timings = Timings()
+
+
+def span(name: str, profile: bool = False):
+    """Time a block of code in the global timings"""
+    return timings.span(name, profile)
+
+
+def record(name: str, seconds: float, post: Optional[str] = None) -> None:
+    """Record one span duration in the global timings"""
+    timings.record(name, seconds, post)
+
+
+@contextmanager
+def post_scope(post) -> Iterator[None]:
+    """Attribute spans recorded inside the block, and in tasks and to_thread calls started from it, to a post"""
+    token = _current_post.set(str(post))
+    try:
+        yield
+    finally:
+        _current_post.reset(token)
+
+
+def add_stats(name: str, provider: Callable[[], Dict[str, Any]]) -> None:
+    """Include a set of counters in the global timings report"""
+    timings.add_stats(name, provider)
+
+
+def enable_profiling(directory: str) -> None:
+    """Profile stage spans and write their dumps to a directory"""
+    timings.profile_dir = directory